@@ -1,53 +1,42 @@
 import ast
-import importlib
+import io
+import operator
 import os
+import pickle
+import re
+import sqlite3
+import sys
+from array import array
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import ast_cache
+from ast_cache import get_tree, hash_content
 
 """
 This script is a comprehensive static analysis tool for a batch of Opentrons 
 protocol files. It iterates through a specified directory, and for each protocol, it:
-1.  Imports the script as a module to access its metadata and functions.
+1.  Parses the script into an Abstract Syntax Tree (AST) without importing it.
 2.  Extracts information like author, protocol name, robot type, and API level.
 3.  Analyzes the `add_parameters` function to summarize user-configurable parameters.
-4.  Scans the file content to identify all loaded hardware modules.
-5.  Uses Abstract Syntax Trees (AST) to find deprecated labware and check for
-    potentially problematic z-height values in `.bottom()` and `.top()` calls.
-6.  Prints a detailed report for each file and a final summary of all findings.
+4.  Uses Abstract Syntax Trees (AST) to identify all loaded hardware modules,
+    find deprecated labware and check for potentially problematic z-height
+    values in `.bottom()` and `.top()` calls.
+5.  Prints a detailed report for each file and a final summary of all findings.
 """
 
 # --- Data Structures and Configuration ---
 
-class MockParameters:
-    """
-    A mock class that simulates the behavior of the Opentrons `Parameters` object.
-    
-    When a protocol's `add_parameters` function is called with an instance of this
-    class, it captures the definitions of each parameter without actually
-    running the full protocol context.
-    """
-    def __init__(self):
-        """Initializes the mock object with an empty list to store parameter definitions."""
-        self.added_parameters = []
-
-    def add_bool(self, variable_name, **kwargs):
-        """Captures a boolean parameter definition."""
-        self.added_parameters.append({"name": variable_name, "type": "bool", **kwargs})
-
-    def add_int(self, variable_name, **kwargs):
-        """Captures an integer parameter definition."""
-        self.added_parameters.append({"name": variable_name, "type": "int", **kwargs})
-
-    def add_str(self, variable_name=None, **kwargs):
-        """Captures a string parameter definition."""
-        self.added_parameters.append({"name": variable_name, "type": "str", **kwargs})
-
-    def add_float(self, variable_name, **kwargs):
-        """Captures a float parameter definition."""
-        self.added_parameters.append({"name": variable_name, "type": "float", **kwargs})
-
-    def add_csv_file(self, variable_name, **kwargs):
-        """Captures a CSV file parameter definition."""
-        self.added_parameters.append({"name": variable_name, "type": "csv", **kwargs})
-
+# A map of the `add_*` methods on the Opentrons `Parameters` object to the
+# type of run-time parameter each one defines.
+PARAMETER_TYPES = {
+    "add_bool": "bool",
+    "add_int": "int",
+    "add_str": "str",
+    "add_float": "float",
+    "add_csv_file": "csv",
+}
 
 # A map of raw search strings to their standardized, human-readable module names.
 MODULE_SEARCH_MAP = {
@@ -62,16 +51,23 @@ MODULE_SEARCH_MAP = {
     "opentrons_tough_pcr_auto_sealing_lid": "PCR Auto Sealing Lid"
 }
 
-# A counter to aggregate the total usage of each module across all protocols.
-module_counter = {
-    "Absorbance Plate Reader Module": 0, 
-    "Thermocycler Module GEN 2": 0,
-    "Flex Stacker Module V1": 0,
-    "Magnetic Block V1": 0,
-    "Heater-Shaker Module GEN 1": 0,
-    "Temperature Module GEN 2": 0,
-    "PCR Auto Sealing Lid": 0,
-}
+# The load calls whose string arguments are matched against `MODULE_SEARCH_MAP`.
+# The auto sealing lid is labware rather than a module, so it is loaded differently.
+MODULE_LOAD_METHODS = ("load_module", "load_labware", "load_lid_stack")
+
+# Matches any search string, used to skip the module check in files that never
+# mention one. Files are scanned as raw bytes, so the regex uses bytes too.
+MODULE_PATTERN = re.compile(b"|".join(re.escape(search_key.encode()) for search_key in MODULE_SEARCH_MAP))
+
+# Each module name once, in the order of `MODULE_SEARCH_MAP`, for ordering the results.
+MODULE_NAMES = tuple(dict.fromkeys(MODULE_SEARCH_MAP.values()))
+
+# Each module name's position in `module_counts`.
+MODULE_INDEX = {module_name: index for index, module_name in enumerate(MODULE_NAMES)}
+
+# The total usage of each module across all protocols, one integer per module
+# in the order of `MODULE_NAMES`.
+module_counts = array('q', [0]) * len(MODULE_NAMES)
 
 # A dictionary for looking up z-height offset variables in the AST.
 z_height_dictionary = {
@@ -91,32 +87,133 @@ z_height_dictionary = {
     "p20_offset_Tube" : 0
 }
 
-# Dictionaries to track the usage of old vs. new reservoir labware.
-old_reservoirs= {
-    "nest_1_reservoir_195ml" : 0,
-    "nest_12_reservoir_15ml" : 0,
-    "nest_1_reservoir_290ml" : 0,
-    "armadillo_96_wellplate_200ul_pcr_full_skirt" : 0,
-    "nest_96_wellplate_2ml_deep" : 0,
-    "No pre-existing Standard" : 0
-}
-new_reservoirs= {
-    "opentrons_96_wellplate_200ul_pcr_full_skirt" : 0,
-    "opentrons_tough_12_reservoir_22ml" : 0,
-    "opentrons_tough_1_reservoir_300ml" : 0,
-    "opentrons_tough_4_reservoir_72ml" : 0,
-    "opentrons_tough_universal_lid" : 0
+# The old vs. new reservoir labware whose usage is tracked, in report order.
+OLD_RESERVOIR_NAMES = (
+    "nest_1_reservoir_195ml",
+    "nest_12_reservoir_15ml",
+    "nest_1_reservoir_290ml",
+    "armadillo_96_wellplate_200ul_pcr_full_skirt",
+    "nest_96_wellplate_2ml_deep",
+    "No pre-existing Standard",
+)
+NEW_RESERVOIR_NAMES = (
+    "opentrons_96_wellplate_200ul_pcr_full_skirt",
+    "opentrons_tough_12_reservoir_22ml",
+    "opentrons_tough_1_reservoir_300ml",
+    "opentrons_tough_4_reservoir_72ml",
+    "opentrons_tough_universal_lid",
+)
+
+# Each load name's position in `old_reservoir_counts` or `new_reservoir_counts`.
+OLD_RESERVOIR_INDEX = {load_name: index for index, load_name in enumerate(OLD_RESERVOIR_NAMES)}
+NEW_RESERVOIR_INDEX = {load_name: index for index, load_name in enumerate(NEW_RESERVOIR_NAMES)}
+
+# The usage of old vs. new reservoir labware across all protocols, one integer
+# per load name. Only the main process updates them.
+old_reservoir_counts = array('q', [0]) * len(OLD_RESERVOIR_NAMES)
+new_reservoir_counts = array('q', [0]) * len(NEW_RESERVOIR_NAMES)
+
+# Every reservoir load name worth reporting, old or new.
+RESERVOIR_NAMES = frozenset(OLD_RESERVOIR_NAMES) | frozenset(NEW_RESERVOIR_NAMES)
+
+# Matches any old or new reservoir load name, used to skip the reservoir check in
+# files that never mention one.
+RESERVOIR_PATTERN = re.compile(b"|".join(re.escape(load_name.encode()) for load_name in RESERVOIR_NAMES))
+
+# Matches the start of a `.bottom(` or `.top(` call. Together with RESERVOIR_PATTERN
+# this lets files with nothing to check skip the AST walk entirely.
+Z_CALL_PATTERN = re.compile(rb"\.\s*(?:bottom|top)\s*\(")
+
+# A cache of the AST findings for each file, keyed by a hash of the file content
+# (see `ast_cache.hash_content`), so a source
+# that appears more than once is only walked once.
+_ANALYSIS_CACHE = {}
+
+# The SQLite file, kept next to this script, that stores each protocol's results
+# between runs so unchanged files don't have to be analyzed again.
+RESULT_CACHE_FILENAME = ".audit_cache.sqlite"
+
+# How many protocol files are read and sent to the workers at a time. Each batch
+# is reported before the next one is read, so at most this many files' contents
+# are held in memory at once.
+READ_BATCH_SIZE = 16
+
+# AST node types bound to plain names for the hot checks, which compare them with
+# `type(node) is ...` instead of looking them up on the `ast` module every time.
+_Attribute = ast.Attribute
+_Call = ast.Call
+_Constant = ast.Constant
+_UnaryOp = ast.UnaryOp
+_USub = ast.USub
+
+# The arithmetic operators `evaluate_expression` supports, keyed by their AST node type.
+_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.USub: operator.neg}
+
+
+def _evaluate_constant(node, values, variables):
+    """Pushes a numeric constant, or fails on anything that isn't a number."""
+    value = node.value
+    if not isinstance(value, (int, float)):
+        raise TypeError("not a number")
+    values.append(value)
+
+
+def _evaluate_name(node, values, variables):
+    """Pushes a variable's value, raising KeyError if it isn't known."""
+    values.append(variables[node.id])
+
+
+def _evaluate_binop(node, values, variables):
+    """Pops both operands (already evaluated) and pushes their result."""
+    right = values.pop()
+    left = values.pop()
+    values.append(_OPS[type(node.op)](left, right))
+
+
+def _evaluate_unaryop(node, values, variables):
+    """Pops the operand (already evaluated) and pushes its negation."""
+    values.append(_OPS[type(node.op)](values.pop()))
+
+
+# Handlers for the AST node types `evaluate_expression` allows, keyed by type.
+# Leaves push their value; operators combine the values their operands pushed.
+_DISPATCH = {
+    ast.Constant: _evaluate_constant,
+    ast.Name: _evaluate_name,
+    ast.BinOp: _evaluate_binop,
+    ast.UnaryOp: _evaluate_unaryop,
 }
 
 # --- Analysis Functions ---
 
+def read_protocol_file(file_path):
+    """
+    Reads a protocol file's content, for prefetching on a background thread.
+
+    Args:
+        file_path (str): The full path to the Python script to read.
+
+    Returns:
+        bytes: The raw file content, or None if it could not be read. The error is
+               left for `get_tree` to raise again, so it is reported with the file.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
 def evaluate_expression(node, variables):
     """
-    Recursively evaluates an AST node representing a simple arithmetic expression.
+    Evaluates an AST node representing a simple arithmetic expression.
 
-    This function can handle constants, variables (looked up in the `variables` 
-    dictionary), and binary operations (+, -). It's used to calculate the 
-    final numeric value of z-heights defined with variables (e.g., `z_offset + 5`).
+    This function can handle numeric constants, variables (looked up in the
+    `variables` dictionary), negation and binary operations (+, -). It's used to
+    calculate the final numeric value of z-heights defined with variables
+    (e.g., `z_offset + 5`). The tree is evaluated in post-order with an explicit
+    stack and a handler per node type in `_DISPATCH`, so deep expressions need
+    neither recursion nor `isinstance` chains.
 
     Args:
         node (ast.AST): The AST node to evaluate.
@@ -126,188 +223,674 @@ def evaluate_expression(node, variables):
         float or int: The calculated result of the expression, or None if it's
                       an unsupported type or operation.
     """
-    # Targets Binary Operations and returns the sum of the operation using the variables (i.e. a provided dictionary) 
-    # and compares the provided values with the found variable.
-    
-    # Base case 1: A constant number
-    if isinstance(node, ast.Constant):
-        if isinstance(node.value, (int, float)):
-            return node.value
-        else:
-            return None # Not a num
-        
-    # Base Case 2: A variable name, looked up in the provided dictionary.
-    elif isinstance(node, ast.Name):
-        return variables.get(node.id)
-    
-    # Recursive Case: A binary operation like '+' or '-'.
-    elif isinstance(node, ast.BinOp):
-        left_val = evaluate_expression(node.left, variables)
-        right_val = evaluate_expression(node.right, variables)
-
-        if left_val is None or right_val is None:
-            return None
-        
-        if isinstance(node.op, ast.Add):
-            return left_val + right_val
-        elif isinstance(node.op, ast.Sub):
-            return left_val - right_val
-        else:
-            return None # Unsupported operation
-    else:
-        return None # Unsupported node type
+    dispatch = _DISPATCH
+    ops = _OPS
+    values = []
+    # Each entry is a node and whether its operands have already been evaluated.
+    stack = [(node, False)]
+    try:
+        while stack:
+            current, expanded = stack.pop()
+            node_type = type(current)
+            if expanded:
+                dispatch[node_type](current, values, variables)
+            elif node_type is ast.BinOp:
+                if type(current.op) not in ops:
+                    return None # Unsupported operation
+                # Revisit after both operands, pushing right first so left is evaluated first.
+                stack.append((current, True))
+                stack.append((current.right, False))
+                stack.append((current.left, False))
+            elif node_type is ast.UnaryOp:
+                if type(current.op) is not ast.USub:
+                    return None # Unsupported operation
+                stack.append((current, True))
+                stack.append((current.operand, False))
+            elif node_type is ast.Constant or node_type is ast.Name:
+                dispatch[node_type](current, values, variables)
+            else:
+                return None # Unsupported node type
+    except (KeyError, TypeError):
+        return None # Not a number, or a variable that isn't in the provided dictionary.
+
+    return values[0]
+
+
+def literal_number(node):
+    """
+    Reads a number written directly in the source, like `5`, `0.5` or `-1`.
+
+    Negative numbers are parsed as a unary minus applied to a constant, so both
+    forms are handled here with a single check each.
+
+    Args:
+        node (ast.AST): The AST node of a call argument.
+
+    Returns:
+        float or int: The number, or None if the node isn't a numeric literal.
+    """
+    # Exact type checks against names bound once, instead of `isinstance` with a
+    # module attribute lookup for every argument checked.
+    node_type = type(node)
+    if node_type is _Constant:
+        value = node.value
+        return value if isinstance(value, (int, float)) else None
+    if node_type is _UnaryOp and type(node.op) is _USub and type(node.operand) is _Constant:
+        value = node.operand.value
+        return -value if isinstance(value, (int, float)) else None
+    return None
+
+
+def walk_nodes(tree):
+    """
+    Yields every node in a tree in source order, using an explicit stack.
+
+    This replaces the recursive descent of `ast.NodeVisitor` and the nested
+    generators of `ast.walk` with a plain loop: children are read straight from
+    each node's `_fields`, so no Python call frame or generator is created per
+    node, and deeply nested protocols can't hit the recursion limit.
+
+    Args:
+        tree (ast.AST): The root node to walk from.
+
+    Yields:
+        ast.AST: Each node, parents before their children.
+    """
+    stack = [tree]
+    pop = stack.pop
+    extend = stack.extend
+    AST = ast.AST
+
+    while stack:
+        node = pop()
+        yield node
+
+        # A child is either a node or a list that may contain nodes.
+        children = []
+        append = children.append
+        for name in node._fields:
+            value = getattr(node, name, None)
+            if isinstance(value, AST):
+                append(value)
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, AST):
+                        append(item)
+
+        # Push children in reverse so they are popped in source order.
+        children.reverse()
+        extend(children)
+
+
+def index_calls(tree):
+    """
+    Groups every attribute call in a tree by the name of the called attribute.
+
+    After this single walk, a check only has to look at the calls it cares
+    about, e.g. `index['bottom']`, instead of walking every node again.
+
+    Args:
+        tree (ast.AST): The parsed script, as returned by `get_tree`.
+
+    Returns:
+        defaultdict: Maps attribute names (str) to lists of `ast.Call` nodes, in source order.
+    """
+    index = defaultdict(list)
+    call_type = _Call
+    attribute_type = _Attribute
+    for node in walk_nodes(tree):
+        if type(node) is call_type and type(node.func) is attribute_type:
+            index[node.func.attr].append(node)
+    return index
+
+
+@dataclass(slots=True)
+class ProtocolAnalysis:
+    """
+    The findings from a single pass over a protocol's AST.
+
+    The fields are fixed in `__slots__`, like `ProtocolAuditor`'s attributes,
+    so the checks update them without going through an instance dict.
 
+    Attributes:
+        z_warnings (list): Warning messages for risky `.bottom()` and `.top()` values,
+                           in the order they were found.
+        z_issues (int): The number of `.bottom()` z-values below the threshold.
+        empty_bottom_issues (int): The number of empty `.bottom()` calls.
+        top_issues (int): The number of `.top()` values below -7.
+        old_res_hits (list): Old reservoir load names found, each listed once.
+        new_res_hits (list): New reservoir load names found, each listed once.
+        loaded_modules (list): The human-readable names of the modules loaded,
+                               each listed once, in the order of `MODULE_SEARCH_MAP`.
+    """
+    z_warnings: list = field(default_factory=list)
+    z_issues: int = 0
+    empty_bottom_issues: int = 0
+    top_issues: int = 0
+    old_res_hits: list = field(default_factory=list)
+    new_res_hits: list = field(default_factory=list)
+    loaded_modules: list = field(default_factory=list)
+
+
+class ProtocolAuditor:
+    """
+    Checks a protocol's AST for z-height issues, reservoirs and modules in a single walk.
 
-def check_z(file_path, threshold = 0.5):
+    Every check in this script is concerned with attribute calls (`.bottom()`,
+    `.top()`, `.load_labware()` and `.load_module()`), so the tree is walked
+    once to index those calls by attribute name, and each check then only
+    visits its own calls. The attributes are fixed in `__slots__`, which makes
+    the lookups done for every checked call a little cheaper.
     """
-    Scans a Python script for z-height values that are below a given threshold.
+    __slots__ = ('threshold', 'check_reservoirs', 'check_modules', 'constants', 'analysis', 'occured', 'z_findings')
+
+    def __init__(self, threshold=0.5, check_reservoirs=True, check_modules=True, constants=None):
+        """
+        Initializes the auditor with an empty set of findings.
+
+        Args:
+            threshold (float, optional): The minimum allowed value for `.bottom()` z-heights.
+                                         Defaults to 0.5.
+            check_reservoirs (bool, optional): Whether to check `load_labware` calls for
+                                               reservoirs. Defaults to True.
+            check_modules (bool, optional): Whether to check load calls for modules.
+                                            Defaults to True.
+            constants (dict, optional): Literal values of module-level names, from
+                                        `extract_static_info`, so load calls like
+                                        `load_module(TC, "B1")` can be resolved. Defaults to None.
+        """
+        self.threshold = threshold
+        self.check_reservoirs = check_reservoirs
+        self.check_modules = check_modules
+        self.constants = constants or {}
+        self.analysis = ProtocolAnalysis()
+        # `occured` prevents double-counting the same labware type if loaded multiple times in one file.
+        self.occured = set()
+        # (line number, message) pairs for z-height warnings. The `.bottom()` and `.top()`
+        # calls are checked separately, so the warnings are put in line order afterwards.
+        self.z_findings = []
+
+    def visit(self, tree):
+        """Runs every check on the matching calls in the tree."""
+        index = index_calls(tree)
+
+        for node in index.get('bottom', ()):
+            self.check_bottom(node)
+        for node in index.get('top', ()):
+            self.check_top(node)
+        # List the warnings in the order they appear in the source (the sort is stable,
+        # so warnings on the same line keep the order they were found in).
+        self.z_findings.sort(key=operator.itemgetter(0))
+        self.analysis.z_warnings = [message for _, message in self.z_findings]
+        if self.check_reservoirs:
+            for node in index.get('load_labware', ()):
+                self.check_load_labware(node)
+        if self.check_modules:
+            found = set()
+            for method in MODULE_LOAD_METHODS:
+                for node in index.get(method, ()):
+                    self.check_load_module(node, found)
+            # Several search strings can map to the same module, so list each module only once.
+            self.analysis.loaded_modules = [module_name for module_name in MODULE_NAMES if module_name in found]
+
+    def check_bottom(self, node):
+        """Checks a `.bottom()` call for z-heights below the threshold."""
+        threshold = self.threshold
+        analysis = self.analysis
+
+        # Case 1: Handle positional arguments like .bottom(-1)
+        if node.args:
+            z_value = literal_number(node.args[0])
+            if z_value is not None and z_value < threshold:
+                self.z_findings.append((node.lineno, f"Warning: Positional z-value of {z_value} on line {node.lineno} is below threshold."))
+                analysis.z_issues += 1
+
+        # Case 2: Handle keyword arguments like .bottom(z=-1)
+        if node.keywords:
+            for keyword in node.keywords:
+                if keyword.arg == 'z':
+                    # Check for simple numbers (positive and negative)
+                    z_value = literal_number(keyword.value)
+                    if z_value is None:
+                        # Try to evaluate complex expressions like `z_offset + 1`
+                        z_value = evaluate_expression(keyword.value, z_height_dictionary)
+                        if isinstance(z_value, (int, float)) and z_value < threshold:
+                            self.z_findings.append((node.lineno, f"Warning: Calculated z-value of {z_value} on line {node.lineno} is below threshold."))
+
+                    if isinstance(z_value, (int, float)) and z_value < threshold:
+                        self.z_findings.append((node.lineno, f"Warning: Keyword z-value of {z_value} on line {node.lineno} is below threshold."))
+                        analysis.z_issues += 1
+
+    def check_top(self, node):
+        """Checks a `.top()` call for values too far below the top of the well."""
+        if node.args: # Check for positional arguments, ex: top(10) or top(-11)
+            z_value = literal_number(node.args[0])
 
-    This function parses the script into an AST and walks through it, looking for
-    `.bottom()` and `.top()` method calls and `z=` keyword arguments. It reports
-    any numeric values that are considered potentially risky.
+            # Check if the value is too far below the top of the well.
+            if z_value is not None and z_value < -7:
+                self.z_findings.append((node.lineno, f"Warning: .top() call on line {node.lineno} has a value ({z_value}) below the threshold of -7."))
+                self.analysis.top_issues += 1
+
+    def check_load_module(self, node, found):
+        """
+        Adds the modules named by a load call's string arguments to `found`.
+
+        Arguments can be string literals or module-level names assigned one,
+        e.g. `TC = "thermocyclerModuleV2"` followed by `load_module(TC, "B1")`.
+        """
+        constants = self.constants
+        for value in [*node.args, *(keyword.value for keyword in node.keywords)]:
+            value_type = type(value)
+            if value_type is ast.Constant:
+                value = value.value
+            elif value_type is ast.Name and value.id in constants:
+                value = constants[value.id]
+            else:
+                continue
+            if isinstance(value, str) and value in MODULE_SEARCH_MAP:
+                found.add(MODULE_SEARCH_MAP[value])
+
+    def check_load_labware(self, node):
+        """Records old and new reservoirs loaded by a `load_labware` call."""
+        if node.args and type(node.args[0]) is ast.Constant:
+            load_name = node.args[0].value
+            # One lookup skips labware that isn't a reservoir, another skips repeats.
+            if load_name not in RESERVOIR_NAMES or load_name in self.occured:
+                return
+            self.occured.add(load_name)
+
+            # Sort the labware name into our lists of old and new reservoirs.
+            if load_name in OLD_RESERVOIR_INDEX:
+                self.analysis.old_res_hits.append(load_name)
+            else:
+                self.analysis.new_res_hits.append(load_name)
+
+
+def analyze_tree(tree, threshold = 0.5, check_reservoirs = True, check_modules = True, constants = None):
+    """
+    Checks z-heights and finds reservoirs and modules in a parsed script with a single AST walk.
 
     Args:
-        file_path (str): The full path to the Python script to check.
+        tree (ast.Module): The parsed script, as returned by `get_tree`.
         threshold (float, optional): The minimum allowed value for `.bottom()` z-heights.
                                      Defaults to 0.5.
+        check_reservoirs (bool, optional): Whether to look for reservoirs. Defaults to True.
+        check_modules (bool, optional): Whether to look for modules. Defaults to True.
+        constants (dict, optional): Literal values of module-level names, from
+                                    `extract_static_info`, used to resolve names passed
+                                    to module load calls. Defaults to None.
+
+    Returns:
+        ProtocolAnalysis: The z-height issues, reservoirs and modules found in the script.
+    """
+    auditor = ProtocolAuditor(threshold, check_reservoirs, check_modules, constants)
+    auditor.visit(tree)
+    return auditor.analysis
+
+
+def get_parameter_name(node):
     """
-    bottom_issues = 0
-    z_issues = 0
-    top_issues= 0
+    Finds the `variable_name` of an `add_*` parameter call.
 
-    with open(file_path, 'r') as f:
-        content = f.read()
+    The name can be passed either as the first positional argument or as the
+    `variable_name` keyword argument.
+
+    Args:
+        node (ast.Call): The `add_*` call node.
+
+    Returns:
+        str: The parameter's variable name, or "Unnamed" if it isn't a string literal.
+    """
+    name_node = node.args[0] if node.args else None
+    for keyword in node.keywords:
+        if keyword.arg == 'variable_name':
+            name_node = keyword.value
+
+    if isinstance(name_node, ast.Constant) and isinstance(name_node.value, str):
+        return name_node.value
+    return "Unnamed"
+
+
+def get_parameter_details(node):
+    """
+    Describes a run-time parameter from its `add_*` call without running it.
+
+    Args:
+        node (ast.Call): The `add_*` call node.
+
+    Returns:
+        dict: The parameter's "name" and "type", plus every keyword argument
+              written as a literal (e.g. "default", "minimum", "maximum" or "choices").
+    """
+    method = node.func.attr
+    details = {"name": get_parameter_name(node), "type": PARAMETER_TYPES.get(method, method[4:])}
+    for keyword in node.keywords:
+        if keyword.arg is None or keyword.arg == 'variable_name':
+            continue # `**kwargs` unpacking, or the name already read above.
+        try:
+            details[keyword.arg] = ast.literal_eval(keyword.value)
+        except (ValueError, TypeError, SyntaxError):
+            pass # Not a literal, e.g. computed from other variables.
+    return details
 
-    tree = ast.parse(content)
 
-    # Walk through every node in the abstract syntax tree.
-    for node in ast.walk(tree):
-        # We only care about attribute calls, like `well.bottom()`.
-        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)):
+def literal_dict(node, constants):
+    """
+    Reads a dictionary written in the source, even if some entries aren't literals.
+
+    Entries whose value is a module-level constant (e.g. `"apiLevel": API_LEVEL`)
+    are resolved through `constants`, and any other entry that can't be read
+    statically is skipped instead of discarding the whole dictionary.
+
+    Args:
+        node (ast.AST): The AST node assigned to the name.
+        constants (dict): Literal values assigned to module-level names so far.
+
+    Returns:
+        dict: The readable entries, or None if the node isn't a dictionary literal.
+    """
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        pass
+    if type(node) is not ast.Dict:
+        return None
+
+    result = {}
+    for key_node, value_node in zip(node.keys, node.values):
+        if type(key_node) is not ast.Constant:
+            continue # `**other` unpacking, or a computed key.
+        if type(value_node) is ast.Name and value_node.id in constants:
+            result[key_node.value] = constants[value_node.id]
             continue
+        try:
+            result[key_node.value] = ast.literal_eval(value_node)
+        except (ValueError, TypeError, SyntaxError):
+            pass # Not a literal, e.g. built from a function call.
+    return result
 
-        # --- Check `.bottom()` calls ---
-        if node.func.attr == 'bottom':
-            # Case 1: Handle positional arguments like .bottom(-1)
-            if node.args:
-                arg_node = node.args[0]
-                z_value = None
-                if isinstance(arg_node, ast.Constant):
-                    z_value = arg_node.value
-                # Handle negative numbers, which are parsed as UnaryOp(USub(...))
-                elif isinstance(arg_node, ast.UnaryOp) and isinstance(arg_node.op, ast.USub):
-                    z_value = -arg_node.operand.value
-
-                if isinstance(z_value, (int, float)) and z_value < threshold:
-                    print(f"Warning: Positional z-value of {z_value} on line {node.lineno} is below threshold.")
-                    z_issues += 1
-            
-            # Case 2: Handle keyword arguments like .bottom(z=-1)
-            if node.keywords:
-                for keyword in node.keywords:
-                    if keyword.arg == 'z':
-                        z_value = None
-                        # Check for simple numbers (positive and negative)
-                        if isinstance(keyword.value, ast.Constant):
-                            z_value = keyword.value.value
-                        elif isinstance(keyword.value, ast.UnaryOp) and isinstance(keyword.value.op, ast.USub):
-                            z_value = -keyword.value.operand.value
-                        else:
-                             # Try to evaluate complex expressions like `z_offset + 1`
-                             z_value = evaluate_expression(keyword.value, z_height_dictionary)
-                             if isinstance(z_value, (int, float)) and z_value < threshold : 
-                                print(f"Warning: Calculated z-value of {z_value} on line {node.lineno} is below threshold.")
 
-                        if isinstance(z_value, (int, float)) and z_value < threshold:
-                            print(f"Warning: Keyword z-value of {z_value} on line {node.lineno} is below threshold.")
-                            z_issues += 1
+def extract_static_info(tree):
+    """
+    Extracts `metadata`, `requirements` and run-time parameters from a parsed protocol.
+
+    Everything is read straight from the AST, so the protocol is never imported
+    and none of its top-level code is run. Opentrons only reads these names at the
+    top level of a protocol, so only module-level statements are inspected. Both
+    plain (`metadata = {...}`) and annotated (`metadata: dict = {...}`) assignments
+    are read, and dictionaries that are only partly literal keep their readable entries.
+
+    Args:
+        tree (ast.Module): The parsed script, as returned by `get_tree`.
+
+    Returns:
+        tuple: The `metadata` dict, the `requirements` dict, a list of parameter
+               dicts from `get_parameter_details`, and a dict of the literal values
+               assigned to other module-level names. Each of the first two is None if
+               it is missing or isn't a dictionary, and the list is None if the script
+               has no `add_parameters` function.
+    """
+    literals = {}
+    # Literal values of other module-level names, for entries like `"apiLevel": API_LEVEL`.
+    constants = {}
+    parameters = None
+
+    for node in tree.body:
+        node_type = type(node)
+        # Dictionaries assigned at module level, e.g. `metadata = {...}`.
+        if node_type is ast.Assign or node_type is ast.AnnAssign:
+            targets = node.targets if node_type is ast.Assign else (node.target,)
+            if node.value is None:
+                continue # A bare annotation, e.g. `metadata: dict`.
+            for target in targets:
+                if type(target) is not ast.Name:
+                    continue
+                if target.id in ('metadata', 'requirements'):
+                    literals[target.id] = literal_dict(node.value, constants)
+                elif type(node.value) is ast.Constant:
+                    constants[target.id] = node.value.value
+
+        # Parameters defined by `parameters.add_*(...)` calls inside `add_parameters`.
+        elif node_type is ast.FunctionDef and node.name == 'add_parameters':
+            parameters = []
+            for call in walk_nodes(node):
+                if (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+                        and call.func.attr.startswith('add_')):
+                    parameters.append(get_parameter_details(call))
+
+    return literals.get('metadata'), literals.get('requirements'), parameters, constants
+
+
+def format_live_results(current_protocol_info):
+    """
+    Builds the live report printed for a single protocol as it finishes.
+
+    The report is written to an in-memory buffer so it can be emitted with a
+    single write, which keeps the output of parallel workers from interleaving.
+
+    Args:
+        current_protocol_info (dict): The protocol information returned by `analyze_one`.
+
+    Returns:
+        str: The formatted report for the protocol.
+    """
+    buf = io.StringIO()
+    buf.write(f"--- Processing {current_protocol_info['filename']} ---\n")
+
+    if "error" in current_protocol_info:
+        buf.write(f"{current_protocol_info['error']}\n")
+    else:
+        analysis = current_protocol_info["analysis"]
+
+        buf.write(f"  Protocol Name: {current_protocol_info.get('protocolName', 'N/A')}\n")
+        buf.write(f"  Author: {current_protocol_info.get('author', 'N/A')}\n")
+        buf.write(f"  Robot Type: {current_protocol_info.get('robotType', 'N/A')}\n")
+        buf.write(f"  Total Parameters: {current_protocol_info.get('total_parameters', 'N/A')}\n")
+
+        buf.write("\n  Incorrect heights of z:\n")
+        for warning in analysis.z_warnings:
+            buf.write(f"{warning}\n")
+        buf.write(f"Total .bottom() z-value issues: {analysis.z_issues}\n")
+        buf.write(f"Total empty .bottom() issues: {analysis.empty_bottom_issues}\n")
+        buf.write(f"Total .top() value issues: {analysis.top_issues}\n")
+
+        buf.write("\n  Reservoir Analysis:\n")
+        for load_name in analysis.old_res_hits:
+            buf.write(f"Old reservoir: {load_name}\n")
+        for load_name in analysis.new_res_hits:
+            buf.write(f"New reservoir: {load_name}\n")
+        buf.write("\n\n")
+
+    buf.write("-" * 30 + "\n") # Separator
+    return buf.getvalue()
+
+
+def analyze_one(file_path, content=None):
+    """
+    Runs every analysis on a single protocol file.
+
+    The function only reads the file and returns what it found, leaving all of
+    the global counters to the caller, so it is safe to run in a worker process.
+
+    Args:
+        file_path (str): The full path to the protocol file.
+        content (bytes, optional): The raw file content, if it was already read.
+
+    Returns:
+        dict: The extracted protocol information. The z-height and reservoir
+              findings are stored under "analysis", any error that stopped the
+              file from being processed under "error", and the formatted live
+              results under "report".
+    """
+    filename = os.path.basename(file_path)
+    current_protocol_info = {"filename": filename}
+
+    try:
+        # Read and parse the file once; every analysis below shares the result.
+        content, content_hash, tree = get_tree(file_path, content)
+        metadata, requirements, parameters, constants = extract_static_info(tree)
+
+        # 1. Extract from metadata dictionary.
+        if isinstance(metadata, dict):
+            current_protocol_info["author"] = metadata.get("author", "N/A")
+            current_protocol_info["protocolName"] = metadata.get("protocolName", "N/A")
+            current_protocol_info["source"] = metadata.get("source", "N/A (not specified)")
+            # Set defaults that might be overridden by 'requirements'.
+            current_protocol_info["robotType"] = metadata.get("robotType", "N/A")
+            current_protocol_info["apiLevel"] = metadata.get("apiLevel", "N/A")
+        else:
+            current_protocol_info["metadata_error"] = "Metadata dictionary not found or invalid."
+            current_protocol_info["robotType"] = "N/A"
+            current_protocol_info["apiLevel"] = "N/A"
+
+        # 2. Extract from requirements, which takes precedence over metadata.
+        if isinstance(requirements, dict):
+            req_robot_type = requirements.get("robotType")
+            req_api_level = requirements.get("apiLevel")
+            if req_robot_type is not None:
+                current_protocol_info["robotType"] = req_robot_type
+            if req_api_level is not None:
+                current_protocol_info["apiLevel"] = req_api_level
+        else:
+            current_protocol_info["requirements_error"] = "Requirements dictionary not found or invalid."
+
+        # 3. Analyze parameters from the add_parameters function.
+        if parameters is not None:
+            current_protocol_info["total_parameters"] = len(parameters)
+            current_protocol_info["parameters"] = parameters
+
+            # Group parameters by their type for a summary.
+            parameter_types_summary = defaultdict(list)
+            for param in parameters:
+                parameter_types_summary[param.get("type", "unknown")].append(param.get("name", "Unnamed"))
+
+            current_protocol_info["parameter_types"] = dict(parameter_types_summary)
+        else:
+            current_protocol_info["parameters_error"] = "add_parameters function not found."
+
+        # 4. Check z-heights and find reservoirs and modules in a single pass over the AST.
+        # Cheap text checks decide whether the walk is needed at all: files that never
+        # mention a reservoir or module name skip those checks, and files that also
+        # make no `.bottom()` or `.top()` calls have nothing to report.
+        analysis = _ANALYSIS_CACHE.get(content_hash)
+        if analysis is None:
+            check_z_calls = Z_CALL_PATTERN.search(content) is not None
+            check_reservoirs = RESERVOIR_PATTERN.search(content) is not None
+            check_modules = MODULE_PATTERN.search(content) is not None
+            if check_z_calls or check_reservoirs or check_modules:
+                analysis = analyze_tree(tree, 0.5, check_reservoirs, check_modules, constants)
+            else:
+                analysis = ProtocolAnalysis()
+            _ANALYSIS_CACHE[content_hash] = analysis
+        current_protocol_info["analysis"] = analysis
+        current_protocol_info["loaded_modules"] = analysis.loaded_modules
 
-        # --- Check `.top()` calls ---
-        elif node.func.attr == 'top':
-            if node.args: # Check for positional arguments
-                arg = node.args[0]
-                z_value = None
-                # Handle positive numbers, ex: top(10)
-                if isinstance(arg, ast.Constant) and isinstance(arg.value, (int, float)):
-                    z_value = arg.value
-                # Handle negative numbers, ex: top(-11)
-                elif (isinstance(arg, ast.UnaryOp) and
-                      isinstance(arg.op, ast.USub) and
-                      isinstance(arg.operand, ast.Constant)):
-                    z_value = -arg.operand.value
+    except SyntaxError as e:
+        current_protocol_info["error"] = f"Error: Could not parse '{filename}'. Ensure it is valid Python. Error: {e}"
+    except Exception as e:
+        current_protocol_info["error"] = f"An unexpected error occurred while processing {filename}: {e}"
 
-                # Check if the value is too far below the top of the well.
-                if z_value is not None and z_value < -7:
-                    print(f"Warning: .top() call on line {node.lineno} has a value ({z_value}) below the threshold of -7.")
-                    top_issues += 1
+    current_protocol_info["report"] = format_live_results(current_protocol_info)
+    return current_protocol_info
 
-    print(f"Total .bottom() z-value issues: {z_issues}")
-    print(f"Total empty .bottom() issues: {bottom_issues}")
-    print(f"Total .top() value issues: {top_issues}")
 
+# --- Result Cache ---
 
-def find_all_reservoirs(file_path, old_reservoirs, new_reservoirs):
+def open_result_cache(cache_path):
     """
-    Scans a script for `load_labware` calls to identify old and new reservoirs.
+    Opens the SQLite database of results from earlier runs, creating it if needed.
+
+    Each row holds the pickled result of `analyze_one` for one protocol path,
+    along with the hashes of the protocol and of the code that analyzed it (see
+    `get_script_hash`), so a result is only reused while neither has changed.
+
+    Args:
+        cache_path (str): The path to the SQLite database file.
+
+    Returns:
+        sqlite3.Connection: The open database connection.
+    """
+    cache = sqlite3.connect(cache_path)
+    cache.execute(
+        "CREATE TABLE IF NOT EXISTS results ("
+        "path TEXT PRIMARY KEY, content_hash TEXT, script_hash TEXT, result BLOB)"
+    )
+    return cache
+
+
+def load_cached_result(cache, file_path, content_hash, script_hash):
+    """
+    Looks up the stored result for a protocol file.
 
     Args:
-        file_path (str): The full path to the Python script.
-        old_reservoirs (dict): A dictionary counter for old labware.
-        new_reservoirs (dict): A dictionary counter for new labware.
-    """
-    with open(file_path, 'r') as f:
-        content = f.read()
-    # `occured` prevents double-counting the same labware type if loaded multiple times in one file.
-    occured = {""}
-    
-    tree = ast.parse(content)
-
-    for node in ast.walk(tree):
-        # Find calls to the 'load_labware' function.
-        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'load_labware':
-            if node.args and isinstance(node.args[0],ast.Constant):
-                load_name = node.args[0].value
-                # Check if the labware name is in our list of old reservoirs.
-                if load_name in old_reservoirs:
-                    if load_name not in occured:
-                        old_reservoirs[load_name] += 1
-                        print(f"Old reservoir: {load_name}")
-                    occured.add(load_name)
-                # Check if the labware name is in our list of new reservoirs.
-                if load_name in new_reservoirs:
-                    if load_name not in occured:
-                        new_reservoirs[load_name] += 1
-                        print(f"New reservoir: {load_name}")
-                    occured.add(load_name)
-
-
-def find_all_modules_in_file(file_path, module_map):
-    """
-    Reads a file once and finds all module strings defined in a map.
-
-    Arguments:
-        file_path (str): The full path to the file to search.
-        module_map (dict): A dictionary where keys are the strings to search for
-                           and values are the module names to return.
+        cache (sqlite3.Connection): The connection returned by `open_result_cache`.
+        file_path (str): The full path to the protocol file.
+        content_hash (str): The hash of the file's current content, from `hash_content`.
+        script_hash (str): The hash of the analyzing code, from `get_script_hash`.
 
     Returns:
-        list: A list of human-readable names for all modules found in the file.
+        dict: The stored result of `analyze_one`, or None if there is no result
+              for this exact file content and script version, or it can't be read.
     """
-    found_modules = []
+    row = cache.execute(
+        "SELECT result FROM results WHERE path = ? AND content_hash = ? AND script_hash = ?",
+        (file_path, content_hash, script_hash),
+    ).fetchone()
+    if row is None:
+        return None
     try:
-        # Read the entire file content into memory.
-        with open(file_path, 'r') as f:
-            content = f.read()
-            
-            # Check for the presence of each search key from the map.
-            for search_key, module_name in module_map.items():
-                if search_key in content:
-                    found_modules.append(module_name)
-    
-    except FileNotFoundError:
-        print(f"Error: The file '{file_path}' was not found.")
-    
-    return found_modules
+        return pickle.loads(row[0])
+    except Exception:
+        # A corrupt or incompatible row is treated as a miss; the file is analyzed
+        # again and the row is replaced with the new result.
+        return None
+
+
+def remove_stale_results(cache, scanned_paths):
+    """
+    Deletes the stored results of protocol files that are no longer scanned,
+    e.g. because they were deleted or renamed, so the cache doesn't keep growing.
+
+    Args:
+        cache (sqlite3.Connection): The connection returned by `open_result_cache`.
+        scanned_paths (list): The full paths of the protocol files scanned in this run.
+    """
+    scanned_paths = set(scanned_paths)
+    stale_paths = [
+        (path,) for (path,) in cache.execute("SELECT path FROM results") if path not in scanned_paths
+    ]
+    if stale_paths:
+        with cache:
+            cache.executemany("DELETE FROM results WHERE path = ?", stale_paths)
+
+
+def store_results(cache, rows):
+    """
+    Saves new results to the cache in a single transaction.
+
+    Args:
+        cache (sqlite3.Connection): The connection returned by `open_result_cache`.
+        rows (list): Tuples of (path, content hash, script hash, pickled result).
+    """
+    with cache:
+        cache.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+
+
+def get_script_hash():
+    """
+    Hashes everything that decides what `analyze_one` returns: this script, the
+    `ast_cache` module it parses with, and the Python version (whose parser and
+    AST can differ).
+
+    Returns:
+        str: A hash, from `hash_content`, that changes whenever any of them does.
+    """
+    with open(__file__, 'rb') as f:
+        script_source = f.read()
+    with open(ast_cache.__file__, 'rb') as f:
+        ast_cache_source = f.read()
+    version = f"py{sys.version_info.major}.{sys.version_info.minor}".encode()
+    return hash_content(b"\0".join((script_source, ast_cache_source, version)))
 
 
 # --- Main Execution Block ---
@@ -322,139 +905,128 @@ if __name__ == "__main__":
 
     print(f"Scanning for protocol files in: {absolute_protocols_path}\n")
 
-    # Iterate through all files in the specified directory.
-    for filename in os.listdir(absolute_protocols_path):
-        # Only process Python files and exclude __init__.py.
-        if filename.endswith('.py') and filename != '__init__.py':
-            module_name = filename[:-3]  # Remove the '.py' extension
-            full_module_import_path = f"{protocols_directory}.{module_name}"
-            full_file_path = os.path.join(absolute_protocols_path, filename)
-
-            print(f"--- Processing {filename} ---")
-            try:
-                # Dynamically import the protocol file as a Python module to access its contents.
-                module = importlib.import_module(full_module_import_path)
-                current_protocol_info = {"filename": filename}
-
-                # 1. Extract from metadata dictionary.
-                if hasattr(module, 'metadata') and isinstance(module.metadata, dict):
-                    current_protocol_info["author"] = module.metadata.get("author", "N/A")
-                    current_protocol_info["protocolName"] = module.metadata.get("protocolName", "N/A")
-                    current_protocol_info["source"] = module.metadata.get("source", "N/A (not specified)")
-                    # Set defaults that might be overridden by 'requirements'.
-                    current_protocol_info["robotType"] = module.metadata.get("robotType", "N/A")
-                    current_protocol_info["apiLevel"] = module.metadata.get("apiLevel", "N/A")
-                else:
-                    current_protocol_info["metadata_error"] = "Metadata dictionary not found or invalid."
-                    current_protocol_info["robotType"] = "N/A"
-                    current_protocol_info["apiLevel"] = "N/A"
-
-                # 2. Extract from requirements, which takes precedence over metadata.
-                if hasattr(module, 'requirements') and isinstance(module.requirements, dict):
-                    req_robot_type = module.requirements.get("robotType")
-                    req_api_level = module.requirements.get("apiLevel")
-                    if req_robot_type is not None:
-                        current_protocol_info["robotType"] = req_robot_type
-                    if req_api_level is not None:
-                        current_protocol_info["apiLevel"] = req_api_level
+    # Collect all Python files in the specified directory, excluding __init__.py.
+    # `os.scandir` yields entries that already carry their full path and file type.
+    with os.scandir(absolute_protocols_path) as entries:
+        protocol_files = [
+            entry.path
+            for entry in entries
+            if entry.is_file() and entry.name.endswith('.py') and entry.name != '__init__.py'
+        ]
+
+    # Results from earlier runs are reused for files whose content is unchanged,
+    # as long as the code analyzing them and the Python version haven't changed either.
+    script_hash = get_script_hash()
+    cache = open_result_cache(os.path.join(current_script_dir, RESULT_CACHE_FILENAME))
+    remove_stale_results(cache, protocol_files)
+    new_results = []
+
+    # Each file is analyzed independently, so spread them across all CPU cores.
+    # A few threads read the files ahead, so disk reads overlap with the workers'
+    # parsing. Files are handled in batches of `READ_BATCH_SIZE`, so only one
+    # batch's contents are held at a time. Results come back in order, and the
+    # counters are only updated here. The worker processes are only started once
+    # a file misses the cache, and never outnumber the files, so fully cached runs
+    # don't pay for a pool.
+    executor = None
+    with ThreadPoolExecutor(max_workers=4) as reader:
+        for batch_start in range(0, len(protocol_files), READ_BATCH_SIZE):
+            batch = protocol_files[batch_start:batch_start + READ_BATCH_SIZE]
+
+            # Only files without a cached result are sent to the workers.
+            pending = []
+            for file_path, content in zip(batch, reader.map(read_protocol_file, batch)):
+                content_hash = None
+                cached_result = None
+                if content is not None:
+                    content_hash = hash_content(content)
+                    cached_result = load_cached_result(cache, file_path, content_hash, script_hash)
+                if cached_result is None:
+                    if executor is None:
+                        executor = ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(protocol_files)))
+                    pending.append((file_path, content_hash, executor.submit(analyze_one, file_path, content)))
                 else:
-                    current_protocol_info["requirements_error"] = "Requirements dictionary not found or invalid."
-
-                # 3. Analyze parameters from the add_parameters function.
-                if hasattr(module, 'add_parameters') and callable(module.add_parameters):
-                    mock_params = MockParameters()
-                    try:
-                        # Call the function with our mock object to capture parameter data.
-                        module.add_parameters(mock_params) 
-                        current_protocol_info["total_parameters"] = len(mock_params.added_parameters)
-                        
-                        # Group parameters by their type for a summary.
-                        parameter_types_summary = {}
-                        for param in mock_params.added_parameters:
-                            param_type = param.get("type", "unknown")
-                            parameter_types_summary.setdefault(param_type, []).append(param.get("name", "Unnamed"))
-                        
-                        current_protocol_info["parameter_types"] = parameter_types_summary
-                    except Exception as e:
-                        current_protocol_info["parameters_error"] = f"Error calling add_parameters: {e}"
+                    pending.append((file_path, content_hash, cached_result))
+
+            for file_path, content_hash, result in pending:
+                if isinstance(result, Future):
+                    current_protocol_info = result.result()
+                    if content_hash is not None:
+                        new_results.append((file_path, content_hash, script_hash, pickle.dumps(current_protocol_info)))
                 else:
-                    current_protocol_info["parameters_error"] = "add_parameters function not found."
+                    current_protocol_info = result
 
-                # 4. Find all loaded hardware modules by scanning the file's text.
-                loaded_modules = find_all_modules_in_file(full_file_path, MODULE_SEARCH_MAP)
-                current_protocol_info["loaded_modules"] = loaded_modules
+                # Print this file's live results with a single write.
+                sys.stdout.write(current_protocol_info.pop("report"))
+                if "error" in current_protocol_info:
+                    continue
+
+                analysis = current_protocol_info.pop("analysis")
 
                 # Store the extracted data for this protocol.
+                module_name = current_protocol_info["filename"][:-3]
                 all_protocols_data[module_name] = current_protocol_info
-                
-                # --- Print Live Results for Current File ---
-                print(f"  Protocol Name: {current_protocol_info.get('protocolName', 'N/A')}")
-                print(f"  Author: {current_protocol_info.get('author', 'N/A')}")
-                print(f"  Robot Type: {current_protocol_info.get('robotType', 'N/A')}")
-                print(f"  Total Parameters: {current_protocol_info.get('total_parameters', 'N/A')}")
-
-                print("\n  Incorrect heights of z:")
-                check_z(full_file_path, 0.5)
-                
-                print("\n  Reservoir Analysis:")
-                find_all_reservoirs(full_file_path, old_reservoirs, new_reservoirs)
-                print("\n")
-
-            except ImportError as e:
-                print(f"Error: Could not import module '{full_module_import_path}'. Ensure file exists and is valid Python. Error: {e}")
-            except Exception as e:
-                print(f"An unexpected error occurred while processing {filename}: {e}")
-            print("-" * 30) # Separator 
+
+                # Merge this file's findings into the global counts by position.
+                for installed_module in current_protocol_info.get("loaded_modules", ()):
+                    module_counts[MODULE_INDEX[installed_module]] += 1
+                for load_name in analysis.old_res_hits:
+                    old_reservoir_counts[OLD_RESERVOIR_INDEX[load_name]] += 1
+                for load_name in analysis.new_res_hits:
+                    new_reservoir_counts[NEW_RESERVOIR_INDEX[load_name]] += 1
+
+    if executor is not None:
+        executor.shutdown()
+
+    store_results(cache, new_results)
+    cache.close()
 
     # --- Final Summary Report ---
-    print("\n=== Comprehensive Report ===")
-    print(f"Total files processed: {len(all_protocols_data)}\n")
+    # The whole report is built as a list of lines and printed with a single write.
+    lines = ["\n=== Comprehensive Report ===", f"Total files processed: {len(all_protocols_data)}\n"]
 
     # Detailed breakdown for each protocol.
     for module_name, data in all_protocols_data.items():
-        print(f"Protocol Module: {module_name}")
-        print(f"  - File: {data.get('filename', 'N/A')}")
-        print(f"  - Protocol Name: {data.get('protocolName', 'N/A')}")
-        print(f"  - Author: {data.get('author', 'N/A')}")
-        print(f"  - Robot Type: {data.get('robotType', 'N/A')}")
-        print(f"  - API Level: {data.get('apiLevel', 'N/A')}")
-        
+        lines.append(f"Protocol Module: {module_name}")
+        lines.append(f"  - File: {data.get('filename', 'N/A')}")
+        lines.append(f"  - Protocol Name: {data.get('protocolName', 'N/A')}")
+        lines.append(f"  - Author: {data.get('author', 'N/A')}")
+        lines.append(f"  - Robot Type: {data.get('robotType', 'N/A')}")
+        lines.append(f"  - API Level: {data.get('apiLevel', 'N/A')}")
+
         # Display parameter breakdown.
         if 'parameter_types' in data:
-            print("  - Parameter Types:")
+            lines.append("  - Parameter Types:")
             for p_type, p_names in data['parameter_types'].items():
-                print(f"    - {p_type.capitalize()}: {len(p_names)} ({', '.join(p_names)})")
+                lines.append(f"    - {p_type.capitalize()}: {len(p_names)} ({', '.join(p_names)})")
         elif 'parameters_error' in data:
-            print(f"  - Parameters Error: {data['parameters_error']}")
-        
+            lines.append(f"  - Parameters Error: {data['parameters_error']}")
+
         # Check for filename consistency.
         if module_name != data.get('protocolName', 'N/A'):
-            print("\n  ^^Protocol Name and File name mismatch.^^") 
-        
-        # Display loaded modules and update the global counter.
+            lines.append("\n  ^^Protocol Name and File name mismatch.^^")
+
+        # Display loaded modules.
         if 'loaded_modules' in data:
-            print("\n  - Loaded Modules:")
+            lines.append("\n  - Loaded Modules:")
             if not data["loaded_modules"]:
-                print("    - N/A")
+                lines.append("    - N/A")
             else:
-                for installed_module in data['loaded_modules']:
-                    print(f"    - {installed_module}")
-                    module_counter[installed_module] += 1
-            print("\n")
+                lines.extend(f"    - {installed_module}" for installed_module in data['loaded_modules'])
+            lines.append("\n")
 
     # Final aggregated counts.
-    print("\n--- Final Summary Counts ---")
-    print("\nTotal Module Usage:")
-    for key, value in module_counter.items():
-        print(f"  - {key}: {value}")
-
-    print("\nOld Reservoir Usage:")
-    for key, value in old_reservoirs.items():
-        print(f"  - {key}: {value}")
-
-    print("\nNew Reservoir Usage:")
-    for key, value in new_reservoirs.items():
-        print(f"  - {key}: {value}")
+    lines.append("\n--- Final Summary Counts ---")
+    lines.append("\nTotal Module Usage:")
+    lines.extend(f"  - {key}: {value}" for key, value in zip(MODULE_NAMES, module_counts))
+
+    lines.append("\nOld Reservoir Usage:")
+    lines.extend(f"  - {key}: {value}" for key, value in zip(OLD_RESERVOIR_NAMES, old_reservoir_counts))
+
+    lines.append("\nNew Reservoir Usage:")
+    lines.extend(f"  - {key}: {value}" for key, value in zip(NEW_RESERVOIR_NAMES, new_reservoir_counts))
+
+    sys.stdout.write("\n".join(lines) + "\n")
 
 '''
 **NOTE**
@@ -1,6 +1,15 @@
 import ast
-import importlib
+import copy
+import io
+import json
 import os
+import re
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+import ast_cache
+from ast_cache import hash_content
 
 
 """
@@ -30,6 +39,27 @@ z_height_dictionary = {
     "p20_offset_Tube" : 0
 }
 
+# Python files in the protocols folder that are never protocols themselves.
+SKIPPED_FILENAMES = frozenset({'__init__.py'})
+
+# The hidden folder, inside the protocols folder, and the JSON file in it that
+# record each protocol's results so unchanged files are skipped on later runs.
+RESULT_INDEX_FOLDER_NAME = ".audit_cache"
+RESULT_INDEX_FILENAME = "index.json"
+
+# The name of the folder the audited protocols are written to, and its full path
+# next to this script. Both are the same for every file, so they're built once.
+OUTPUT_FOLDER_NAME = "Z_Test_Audited"
+AUDITED_DIRECTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), OUTPUT_FOLDER_NAME)
+
+# Create the output directory once if it doesn't already exist. This runs on import,
+# so `check_z` can write its files when called from other scripts too.
+os.makedirs(AUDITED_DIRECTORY_PATH, exist_ok=True)
+
+# Matches a `z=` keyword or the start of a `.bottom(` or `.top(` call. Files without
+# any of these have nothing to correct, so they are skipped before being parsed.
+Z_CHECK_PATTERN = re.compile(rb"\bz\s*=|\.\s*(?:bottom|top)\s*\(")
+
 def evaluate_expression(node, variables):
     """
     Recursively evaluates an AST node representing a simple arithmetic expression.
@@ -83,110 +113,317 @@ def evaluate_expression(node, variables):
         # Unsupported node type (e.g., a function call).
         return None
 
-def check_z(file_path, threshold=0.5):
+
+# AST node types bound to plain names for the hot checks in `Z_Changer`, which
+# compare them with `type(node) is ...` instead of looking them up on the `ast`
+# module for every visited node.
+_Attribute = ast.Attribute
+_Call = ast.Call
+_Constant = ast.Constant
+_UnaryOp = ast.UnaryOp
+_USub = ast.USub
+
+
+class Z_Changer:
+    """
+    Finds and modifies Z-height values in a parsed script.
+
+    Every value it checks is an argument of a call, so instead of dispatching
+    through a NodeTransformer for every node in the tree, `visit` walks the
+    tree once with an explicit stack and only inspects `ast.Call` nodes,
+    correcting their arguments in place.
+
+    The class is defined once at module level and configured per file, instead
+    of being rebuilt inside `check_z` for every file.
+    """
+    def __init__(self, threshold=0.5, out=None):
+        """
+        Starts with no modifications recorded.
+
+        Args:
+            threshold (float, optional): The minimum allowed value for certain Z-heights.
+                                         Defaults to 0.5.
+            out (file, optional): Where to print warnings. Defaults to None, which
+                                  prints to standard output.
+        """
+        self.threshold = threshold
+        self.out = out
+        # Every corrected value is the same number, so its replacement nodes are
+        # made from one template instead of building new keyword nodes each time.
+        self.replacement = ast.Constant(value=threshold)
+        # Set once any value is corrected, so unchanged scripts aren't written out.
+        self.modified = False
+
+    def corrected(self, original):
+        """
+        Returns a copy of the replacement constant placed where `original` was.
+        """
+        return ast.copy_location(copy.copy(self.replacement), original)
+
+    def visit(self, tree):
+        """
+        Corrects the Z-heights in every call in the tree, in place.
+
+        Args:
+            tree (ast.AST): The parsed script.
+
+        Returns:
+            ast.AST: The same tree, possibly modified.
+        """
+        call_checks = self.call_checks
+        stack = [tree]
+        pop = stack.pop
+        push = stack.extend
+        while stack:
+            node = pop()
+            if type(node) is _Call:
+                # Keyword arguments like `z=...` can appear in any call.
+                for keyword in node.keywords:
+                    self.check_keyword(keyword)
+                # Positional values are only checked in `.bottom()` and `.top()` calls.
+                func = node.func
+                if type(func) is _Attribute:
+                    check = call_checks.get(func.attr)
+                    if check is not None:
+                        check(self, node)
+
+            # Queue the children in reverse, so they are checked in source order.
+            children = []
+            append = children.append
+            for name in node._fields:
+                value = getattr(node, name, None)
+                if isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, ast.AST):
+                            append(item)
+                elif isinstance(value, ast.AST):
+                    append(value)
+            children.reverse()
+            push(children)
+        return tree
+
+    def check_keyword(self, node):
+        """
+        Corrects a `z=...` keyword argument below the threshold.
+        """
+        # Check for a keyword argument named 'z' with a constant value.
+        value = node.value
+        if node.arg == 'z' and type(value) is _Constant:
+            z_value = value.value
+            if isinstance(z_value, (int, float)) and z_value < self.threshold:
+                # If the value is below the threshold, replace it in place
+                # with the corrected value.
+                node.value = self.corrected(value)
+                self.modified = True
+
+    def check_bottom(self, node):
+        """
+        Corrects a positional z-value below the threshold in a `.bottom()` call.
+        """
+        # Check if the call has positional arguments, e.g. `well.bottom(0)`.
+        if node.args and type(node.args[0]) is _Constant:
+            z_value = node.args[0].value
+            if isinstance(z_value, (int, float)) and z_value < self.threshold:
+                # If the value is too low, replace the argument node.
+                node.args[0] = self.corrected(node.args[0])
+                self.modified = True
+
+    def check_top(self, node):
+        """
+        Reports a `.top()` call with a large negative value.
+        """
+        if node.args: # Check if there are arguments
+            arg = node.args[0]
+            z_value = None
+
+            # Handle positive numbers, e.g., top(10)
+            arg_type = type(arg)
+            if arg_type is _Constant and isinstance(arg.value, (int, float)):
+                z_value = arg.value
+            # Handle negative numbers, e.g., top(-11) by checking for a Unary Subtraction operation.
+            elif (arg_type is _UnaryOp and
+                  type(arg.op) is _USub and
+                  type(arg.operand) is _Constant):
+                z_value = -arg.operand.value
+
+            # If a valid number was found, check it against the threshold for large negative values.
+            if z_value is not None and z_value < -7:
+                #node.args[0] = ast.Constant(value=-7) #Remove the comment to make it replace instances less than -7.
+                print(f"Top value with large negative found on line: {node.lineno}", file=self.out)
+
+    # The check to run for each method name, so a call is matched with one lookup.
+    call_checks = {'bottom': check_bottom, 'top': check_top}
+
+
+def check_z(file_path, threshold=0.5, out=None, content=None):
     """
     Reads a Python script, corrects low Z-height values, and writes a new, audited file.
 
     This function parses the script into an AST and uses the `Z_Changer` class
     to find and modify z-heights in `z=` keyword arguments and in `.bottom()` and 
     `.top()` method calls.
+    Scripts that never mention `z=`, `.bottom(` or `.top(` are skipped without
+    being parsed, and no audited file is written for them or for scripts where
+    nothing needed correcting.
 
     Args:
         file_path (str): The full path to the Python script to check.
         threshold (float, optional): The minimum allowed value for certain Z-heights. 
                                      Defaults to 0.5.
+        out (file, optional): Where to print the results. Defaults to None, which
+                              prints to standard output.
+        content (bytes, optional): The raw file content, if it was already read.
+
+    Returns:
+        str: The path of the audited file written, None if nothing needed writing,
+             or False if writing the audited file failed.
     """
-    with open(file_path, 'r') as f:
+    if content is None:
+        with open(file_path, 'rb') as f:
             content = f.read()
 
-    tree = ast.parse(content)
+    # A cheap search of the raw bytes skips parsing files with nothing to correct.
+    if Z_CHECK_PATTERN.search(content) is None:
+        print(f"No z-heights to check in '{os.path.basename(file_path)}', skipped.", file=out)
+        return None
 
-    class Z_Changer(ast.NodeTransformer):
-        """
-        An AST NodeTransformer that finds and modifies Z-height values in code.
-        """
-        def visit_keyword(self, node):
-            """
-            Visits keyword arguments, specifically looking for `z=...`.
-            """
-            # Check for a keyword argument named 'z' with a constant value.
-            if node.arg == 'z' and isinstance(node.value, ast.Constant):
-                z_value = node.value.value
-                if isinstance(z_value, (int, float)) and z_value < threshold:
-                    # If the value is below the threshold, return a new keyword node
-                    # with the corrected value.
-                    return ast.keyword(arg='z', value=ast.Constant(value=threshold))
-            # Important: process other nodes as usual.
-            return super().generic_visit(node)
-
-        def visit_Call(self, node):
-            """
-            Visits function calls, specifically looking for `.bottom()` and `.top()`.
-            """
-            # First, visit all children of this node to ensure they are processed.
-            node = super().generic_visit(node)
-            
-            # Check for method calls like `well.bottom(z=...)`
-            if isinstance(node.func, ast.Attribute) and node.func.attr == 'bottom':
-                # Check if the call has positional arguments.
-                if node.args and isinstance(node.args[0], ast.Constant):
-                    z_value = node.args[0].value
-                    if isinstance(z_value, (int, float)) and z_value < threshold:
-                        # If the value is too low, replace the argument node.
-                        node.args[0] = ast.Constant(value=threshold)
-            
-            # Check for method calls like `well.top(z=...)`
-            elif isinstance(node.func, ast.Attribute) and node.func.attr == 'top':
-                if node.args: # Check if there are arguments
-                    arg = node.args[0]
-                    z_value = None
-
-                    # Handle positive numbers, e.g., top(10)
-                    if isinstance(arg, ast.Constant) and isinstance(arg.value, (int, float)):
-                        z_value = arg.value
-                    # Handle negative numbers, e.g., top(-11) by checking for a Unary Subtraction operation.
-                    elif (isinstance(arg, ast.UnaryOp) and
-                          isinstance(arg.op, ast.USub) and
-                          isinstance(arg.operand, ast.Constant)):
-                        z_value = -arg.operand.value
-
-                    # If a valid number was found, check it against the threshold for large negative values.
-                    if z_value is not None and z_value < -7:
-                        #node.args[0] = ast.Constant(value=-7) #Remove the comment to make it replace instances less than -7.
-                        print(f"Top value with large negative found on line: {node.lineno}")
-
-            # Return the fully processed (and possibly modified) node.
-            return node
+    # The tree is modified in place below, so it is parsed here rather than taken
+    # from the shared cache in `ast_cache`.
+    tree = ast.parse(content, filename=file_path)
 
     # --- Apply Transformation and Write New File ---
-    transformer = Z_Changer()
+    transformer = Z_Changer(threshold, out)
     new_tree = transformer.visit(tree)
-    ast.fix_missing_locations(new_tree)
 
-    # Unparse the modified AST back into a string of Python code.
+    # Nothing was corrected, so there is no need to unparse or write anything.
+    if not transformer.modified:
+        print(f"No z-heights needed correcting in '{os.path.basename(file_path)}', nothing written.", file=out)
+        return None
+
+    # Unparse the modified AST back into a string of Python code. `ast.unparse`
+    # doesn't read node locations, and every replacement node copies its location
+    # from the node it replaced anyway, so `ast.fix_missing_locations` isn't needed.
     new_code = ast.unparse(new_tree)
 
     # --- File Output Logic ---
-    # Define the name for the output folder.
-    output_folder_name = "Z_Test_Audited"
-    # Get the directory of the currently running script.
-    script_directory = os.path.dirname(os.path.abspath(__file__))
-    # Create the full path for the output directory.
-    audited_directory_path = os.path.join(script_directory, output_folder_name)
-    # Create the directory if it doesn't already exist.
-    os.makedirs(audited_directory_path, exist_ok=True)
-
-    # Create the new file path inside the new directory, prefixed with "AUDIT_".
+    # Create the new file path inside the output directory, prefixed with "AUDIT_".
+    # The directory itself is created once, before any file is processed.
     new_filename = "AUDIT_" + os.path.basename(file_path)
-    new_filepath = os.path.join(audited_directory_path, new_filename)
+    new_filepath = Path(AUDITED_DIRECTORY_PATH, new_filename)
 
-    # Write the modified code to the new file.
+    # Write the modified code to a temporary file in a single call, then move it
+    # into place, so an interrupted run never leaves a half-written audited file.
+    temp_filepath = new_filepath.with_name(f"{new_filename}.{os.getpid()}.tmp")
     try:
-        with open(new_filepath, 'w') as f: 
-            f.write(new_code)
-        print(f"Successfully created and wrote to '{new_filename}' in '{output_folder_name}'")
+        temp_filepath.write_text(new_code, encoding='utf-8')
+        os.replace(temp_filepath, new_filepath)
+        print(f"Successfully created and wrote to '{new_filename}' in '{OUTPUT_FOLDER_NAME}'", file=out)
+        return str(new_filepath)
     except Exception as e:
-        print(f"Error writing file '{new_filename}': {e}")
+        temp_filepath.unlink(missing_ok=True)
+        print(f"Error writing file '{new_filename}': {e}", file=out)
+        return False
+
+
+def process_one(file_path, threshold=0.5, content=None):
+    """
+    Checks a single protocol file and collects everything it would print.
+
+    The output is written to an in-memory buffer and returned, so files can be
+    checked in worker processes without their output interleaving.
+
+    Args:
+        file_path (str): The full path to the Python script to check.
+        threshold (float, optional): The minimum allowed value for certain Z-heights.
+                                     Defaults to 0.5.
+        content (bytes, optional): The raw file content, if it was already read.
+
+    Returns:
+        tuple: The output for this file (str), the path of the audited file written
+               (str, or None), and whether the check finished without errors (bool).
+    """
+    audited_path = None
+    completed = False
+    buf = io.StringIO()
+    filename = os.path.basename(file_path)
+    buf.write(f"--- Processing {filename} ---\n")
+
+    try:
+        # `check_z` only analyzes the source statically, so the protocol is never imported.
+        buf.write("Checking for incorrect z-heights:\n")
+        audited_path = check_z(file_path, threshold, buf, content)
+        buf.write("\n\n")
+        # A failed write is reported, but isn't a result worth reusing.
+        completed = audited_path is not False
+        audited_path = audited_path or None
+
+    except Exception as e:
+        buf.write(f"An unexpected error occurred while processing {filename}: {e}\n")
+    buf.write("-" * 30 + "\n") # Separator
+    return buf.getvalue(), audited_path, completed
+
+
+def load_result_index(index_path, script_hash, threshold):
+    """
+    Loads the results of earlier runs, if they still apply.
+
+    Args:
+        index_path (str): The path of the JSON index file.
+        script_hash (str): The hash returned by `get_script_hash`.
+        threshold (float): The threshold used for this run.
+
+    Returns:
+        dict: Maps each protocol's filename to a dict with its content "hash" and
+              the "audited_path" written for it (or None).
+              Empty if there is no index, or it was made by another version of this
+              script or with another threshold.
+    """
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get("script_hash") != script_hash or index.get("threshold") != threshold:
+        return {}
+    return index.get("files", {})
+
+
+def get_script_hash():
+    """
+    Hashes everything that decides what `process_one` returns: this script, the
+    `ast_cache` module it imports, and the Python version (whose parser and
+    `ast.unparse` output can differ).
+
+    Returns:
+        str: A hash, from `hash_content`, that changes whenever any of them does.
+    """
+    with open(__file__, 'rb') as f:
+        script_source = f.read()
+    with open(ast_cache.__file__, 'rb') as f:
+        ast_cache_source = f.read()
+    version = f"py{sys.version_info.major}.{sys.version_info.minor}".encode()
+    return hash_content(b"\0".join((script_source, ast_cache_source, version)))
+
+
+def save_result_index(index_path, script_hash, threshold, files):
+    """
+    Saves the results of this run for the next one, replacing the old index atomically.
+
+    Args:
+        index_path (str): The path of the JSON index file.
+        script_hash (str): The hash returned by `get_script_hash`.
+        threshold (float): The threshold used for this run.
+        files (dict): The results per filename, as returned by `load_result_index`.
+    """
+    index = {"script_hash": script_hash, "threshold": threshold, "files": files}
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(temp_path, index_path)
+    except OSError:
+        pass # The index is only an optimization.
 
 
 # --- Main Execution Block ---
@@ -200,29 +437,67 @@ if __name__ == "__main__":
 
     print(f"Scanning for protocol files in: {absolute_protocols_path}\n")
 
-    # Iterate through all files in the specified directory.
-    for filename in os.listdir(absolute_protocols_path):
-        # Only process Python files, excluding __init__.py.
-        if filename.endswith('.py') and filename != '__init__.py':
-            full_file_path = os.path.join(absolute_protocols_path, filename)
-            print(f"--- Processing {filename} ---")
-            
-            try:
-                # The import logic is included here, though the `check_z` function
-                # performs static analysis and does not require the module to be executed.
-                # This could be used for other dynamic checks in the future.
-                module_name = filename[:-3]
-                full_module_import_path = f"{protocols_directory}.{module_name}"
-
-                # Initialize a dictionary to store data for this specific protocol.
-                current_protocol_info = {"filename": filename}
-                
-                print("Checking for incorrect z-heights:")
-                check_z(full_file_path, 0.5)
-                print("\n")
-
-            except ImportError as e:
-                print(f"Error: Could not import module '{full_module_import_path}'. Ensure file exists and is valid Python. Error: {e}")
-            except Exception as e:
-                print(f"An unexpected error occurred while processing {filename}: {e}")
-            print("-" * 30) # Separator
+    # Collect all Python files in the specified directory, excluding __init__.py and
+    # hidden files. `os.scandir` yields entries that already carry their full path
+    # and file type, and the cheap name checks run before the file type is looked at.
+    with os.scandir(absolute_protocols_path) as entries:
+        protocol_entries = [
+            entry
+            for entry in entries
+            if (name := entry.name).endswith('.py') and name not in SKIPPED_FILENAMES
+            and not name.startswith('.') and entry.is_file()
+        ]
+
+    # Results from earlier runs are reused for files whose content is unchanged, as
+    # long as their audited file still exists and this script and threshold haven't
+    # changed either. Only the main process reads and writes the index.
+    threshold = 0.5
+    script_hash = get_script_hash()
+    index_path = os.path.join(absolute_protocols_path, RESULT_INDEX_FOLDER_NAME, RESULT_INDEX_FILENAME)
+    results = load_result_index(index_path, script_hash, threshold)
+
+    # Each file is checked independently, so spread them across all CPU cores. Every
+    # file's output comes back as a single string and is printed in order, and files
+    # with a reusable result are reported as reused. The worker processes are only
+    # started once a file has no reusable result.
+    executor = None
+    pending = []
+    # Names used for every file, bound once outside the loop.
+    append = pending.append
+    get_result = results.get
+    exists = os.path.exists
+    for entry in protocol_entries:
+        try:
+            content = Path(entry.path).read_bytes()
+        except OSError:
+            content = None # Left for `check_z` to report.
+        content_hash = hash_content(content) if content is not None else None
+
+        result = get_result(entry.name)
+        if (result is not None and result["hash"] == content_hash
+                and (result["audited_path"] is None or exists(result["audited_path"]))):
+            append((entry.name, content_hash, result))
+        else:
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=max(1, min(os.cpu_count() or 1, len(protocol_entries))))
+            append((entry.name, content_hash, executor.submit(process_one, entry.path, threshold, content)))
+
+    for filename, content_hash, result in pending:
+        if isinstance(result, Future):
+            output, audited_path, completed = result.result()
+            if completed and content_hash is not None:
+                results[filename] = {"hash": content_hash, "audited_path": audited_path}
+        else:
+            audited_path = result["audited_path"]
+            if audited_path is None:
+                reuse_note = "nothing needed writing."
+            else:
+                reuse_note = f"reusing '{os.path.basename(audited_path)}' in '{OUTPUT_FOLDER_NAME}'."
+            output = (f"--- Processing {filename} ---\n"
+                      f"Unchanged since the last run, {reuse_note}\n"
+                      + "-" * 30 + "\n")
+        sys.stdout.write(output)
+
+    if executor is not None:
+        executor.shutdown()
+    save_result_index(index_path, script_hash, threshold, results)
@@ -1,5 +1,10 @@
 import subprocess
 import os
+import sys
+import importlib.util
+import io
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from Randomized_RTP import find_parameters, print_param_details
 import pprint
 
@@ -23,55 +28,96 @@ show_all_results = input("\nPlease enter (y/n) if you would like to see successf
 # If true it will show both successful and failed protocols, default only shows errors.
 
 
+# Python files in the target folder that are never protocols themselves.
+SKIPPED_FILENAMES = frozenset({'__init__.py'})
+
+# The command that runs the simulator. If the Opentrons package is importable by this
+# Python, run its module directly, which skips the PATH lookup and the console-script
+# wrapper that `opentrons_simulate` starts through. Otherwise fall back to that command.
+if importlib.util.find_spec("opentrons") is not None:
+    SIMULATE_COMMAND = (sys.executable, "-m", "opentrons.simulate")
+else:
+    SIMULATE_COMMAND = ("opentrons_simulate",)
+
 # --- Initialization ---
 # Counters and lists to track the results of the simulation run.
 failure_count = 0
 failed_file_names = []
 
 # --- Main Simulation Loop ---
-# Iterate through every file in the target directory.
-for filename in os.listdir(absolute_protocols_path):
-    try:
-        # Process only Python files, excluding '__init__.py'.
-        if filename.endswith('.py') and filename != '__init__.py':
-            # Execute the 'opentrons_simulate' command for the current file.
-            result = subprocess.run(
-                ["opentrons_simulate", filename],
-                cwd=absolute_protocols_path,  # Run the command from within the target directory.
-                capture_output=True,          # Capture the stdout and stderr streams.
-                text=True,                    # Decode stdout/stderr as text (instead of bytes).
-                check=True                    # If the command returns a non-zero exit code (fails), raise an exception.
-            )
+# Collect the Python files in the target directory, excluding '__init__.py' and hidden
+# files. `os.scandir` yields entries that already carry their file type, and the cheap
+# name checks run before it is looked at.
+with os.scandir(absolute_protocols_path) as entries:
+    protocol_filenames = [
+        entry.name
+        for entry in entries
+        if (name := entry.name).endswith('.py') and name not in SKIPPED_FILENAMES
+        and not name.startswith('.') and entry.is_file()
+    ]
+
+def run_one(filename):
+    """
+    Runs the Opentrons simulator on a single protocol file.
+
+    The work happens in a child process, so several of these can run at once
+    from a thread pool without being held back by the GIL.
+
+    Args:
+        filename (str): The name of the protocol file inside the target directory.
+
+    Returns:
+        tuple: The filename (str), the simulator's exit code (int), and its
+               captured stdout (str, or None if it isn't shown) and stderr (str).
+    """
+    # Execute the simulator for the current file.
+    result = subprocess.run(
+        [*SIMULATE_COMMAND, filename],
+        cwd=absolute_protocols_path,  # Run the command from within the target directory.
+        # Only keep stdout if successful results are shown; otherwise the OS discards
+        # it, so long simulator logs are never copied into this process.
+        stdout=subprocess.PIPE if show_all_results else subprocess.DEVNULL,
+        stderr=subprocess.PIPE,       # Capture stderr, which holds the error for failed runs.
+        text=True,                    # Decode stdout/stderr as text (instead of bytes).
+    )
+    return filename, result.returncode, result.stdout, result.stderr
+
+# Simulations are independent, so run one per CPU core at a time, and report
+# each one as soon as it finishes, so results appear in completion order. Each
+# result is built as one string and printed with a single write, so output from
+# different files never interleaves. Results are only collected and recorded here.
+with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+    futures = [executor.submit(run_one, filename) for filename in protocol_filenames]
+    for future in as_completed(futures):
+        try:
+            filename, returncode, stdout, stderr = future.result()
+        except FileNotFoundError:
+            # This runs if the 'opentrons_simulate' command itself isn't found in the system's PATH.
+            sys.stdout.write("Error: 'opentrons_simulate' command not found.\n"
+                             "Is the Opentrons software installed and in your system's PATH?\n")
+            # No further simulations can be run, so drop the ones that haven't started.
+            executor.shutdown(wait=True, cancel_futures=True)
+            break
+
+        if returncode != 0:
+            # The simulation itself failed (e.g., a bug in the protocol).
+            # The actual Opentrons error message is in stderr. For the failed file,
+            # also find its parameters for easier debugging. Anything printed while
+            # doing so is captured and written along with the error.
+            with redirect_stdout(io.StringIO()) as param_out:
+                current_protocol_info = find_parameters(filename, absolute_protocols_path)
+                print_param_details(current_protocol_info)
+            sys.stdout.write(f"\n--- Simulator Error Output (stderr) ---\n{filename}\n\n{stderr}\n\n\n"
+                             + param_out.getvalue())
             
-            # This part will only run if the simulation is successful (because check=True did not raise an error).
-            if show_all_results:
-                print("--- Simulation Successful ---")
-                print(f"{filename}\n")
-                print(f"{result.stdout}\n\n\n")
-
-    except subprocess.CalledProcessError as e:
-        # This block catches errors when the simulation itself fails (e.g., a bug in the protocol).
-        # The actual Opentrons error message is in stderr.
-        print("\n--- Simulator Error Output (stderr) ---")
-        print(f"{filename}\n")
-        print(f"{e.stderr}\n\n")
-        
-        # For the failed file, find and print its parameters for easier debugging.
-        current_protocol_info = find_parameters(filename, absolute_protocols_path)
-        print_param_details(current_protocol_info)
-        
-        # Record the failure.
-        failure_count += 1
-        failed_file_names.append(filename)
-        
-    except FileNotFoundError:
-        # This runs if the 'opentrons_simulate' command itself isn't found in the system's PATH.
-        print("Error: 'opentrons_simulate' command not found.")
-        print("Is the Opentrons software installed and in your system's PATH?")
-        break # Exit the loop as no further simulations can be run.
+            # Record the failure.
+            failure_count += 1
+            failed_file_names.append(filename)
+
+        elif show_all_results:
+            sys.stdout.write(f"--- Simulation Successful ---\n{filename}\n\n{stdout}\n\n\n\n")
 
 # --- Final Report ---
-# Print the total number of failures.
 print(f"\nNumber of failures: {failure_count}")
 
 # Ask the user if they want to see the list of failed files.
@@ -90,13 +136,12 @@ if view_failed_files:
         Returns:
             int: The extracted number, or -1 if no number is found.
         """
-        try:
-            # Split the filename by '_' and convert the first part to an integer.
-            return int(filename.split('_')[0])
-        except (ValueError, IndexError):
-            # If splitting or conversion fails (e.g., for '.DS_Store'),
-            # return -1 to place it at the beginning of the sorted list.
-            return -1
+        # Only the text before the first '_' is needed, and checking it is made of
+        # digits avoids raising and catching an exception for every other name.
+        head, _, _ = filename.partition('_')
+        # If there is no number (e.g., for '.DS_Store'), return -1 to place it at
+        # the beginning of the sorted list.
+        return int(head) if head.isdecimal() else -1
 
     # Sort the list of failed files numerically based on their prefix.
     failed_file_names.sort(key=get_numeric_part)
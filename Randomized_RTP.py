@@ -1,9 +1,40 @@
-import importlib.util
+import argparse
+import io
 import os
+import sys
 import itertools
+import math
+from collections import OrderedDict
+from collections.abc import Iterator
 import pprint
 import ast
+import functools
+import re
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
+
+@dataclass(slots=True)
+class ParamDetail:
+    """
+    The details of one runtime parameter found by `find_parameters`.
+
+    The fields are fixed in `__slots__`, so each parameter takes less memory
+    than a dict and its details are read as plain attributes.
+
+    Attributes:
+        type (str): The parameter type ('bool', 'int', 'float', 'str' or 'csv').
+        default (Any): The default value.
+        min (Any): The minimum value, or None if there isn't one.
+        max (Any): The maximum value, or None if there isn't one.
+        choices (list | None): The choice dictionaries ('display_name' and 'value'),
+                               or None if there aren't any.
+    """
+    type: str
+    default: Any = None
+    min: Any = None
+    max: Any = None
+    choices: list | None = None
 
 class MockParameters:
     """
@@ -12,37 +43,117 @@ class MockParameters:
     This class simulates the behavior of a parameter-handling interface by 
     providing `add_*` methods. When a script calls these methods, instead of 
     configuring a real application, this class simply records the parameter's 
-    details (name, type, default value, etc.) in a list for later inspection.
+    details (type, default value, etc.) as a `ParamDetail`, keyed by its name,
+    ready to be returned by `find_parameters` as they are.
     """
     def __init__(self):
-        """Initializes the MockParameters instance with an empty list to store parameters."""
-        self.added_parameters = []
+        """Initializes the MockParameters instance with an empty dict to store parameters."""
+        self.parameter_details = {}
 
     def add_bool(self, variable_name, default=None, **kwargs):
         """Stores the definition of a boolean parameter."""
-        self.added_parameters.append({"name": variable_name, "type": "bool", "default_value": default, **kwargs})
+        self.parameter_details[variable_name] = ParamDetail("bool", default)
 
     def add_int(self, variable_name, default=None, minimum=None, maximum=None, **kwargs):
         """Stores the definition of an integer parameter."""
-        self.added_parameters.append({"name": variable_name, "type": "int", "default_value": default, "minimum": minimum, "maximum": maximum, **kwargs})
+        self.parameter_details[variable_name] = ParamDetail("int", default, minimum, maximum)
 
     def add_str(self, variable_name=None, default=None, choices=None, **kwargs):
         """Stores the definition of a string parameter."""
-        self.added_parameters.append({"name": variable_name, "type": "str", "default_value": default, "choices": choices, **kwargs})
+        self.parameter_details[variable_name] = ParamDetail("str", default, choices=choices)
 
     def add_float(self, variable_name, default=None, minimum=None, maximum=None, **kwargs):
         """Stores the definition of a float parameter."""
-        self.added_parameters.append({"name": variable_name, "type": "float", "default_value": default, "minimum": minimum, "maximum": maximum, **kwargs})
+        self.parameter_details[variable_name] = ParamDetail("float", default, minimum, maximum)
 
     def add_csv_file(self, variable_name, default=None, **kwargs):
         """Stores the definition of a CSV file parameter."""
-        self.added_parameters.append({"name": variable_name, "type": "csv", "default_value": default, **kwargs})
+        self.parameter_details[variable_name] = ParamDetail("csv", default)
+
+# Namespaces of protocol scripts that have already been run, keyed by their path and
+# modification time, so a script is only compiled and its top-level code (imports,
+# definitions) only runs once per version. Only the most recently used
+# `NAMESPACE_CACHE_SIZE` are kept, so scanning many scripts doesn't keep every
+# one of them (and everything it imported or built) alive.
+NAMESPACE_CACHE_SIZE = 8
+_NAMESPACE_CACHE = OrderedDict()
+
+# The node types allowed in the arguments of a self-contained `add_parameters` function:
+# literal values only, so the calls never depend on anything else in the script.
+LITERAL_NODE_TYPES = (
+    ast.Constant, ast.List, ast.Tuple, ast.Set, ast.Dict, ast.Load,
+    ast.UnaryOp, ast.USub, ast.UAdd,
+)
+
+def find_pure_add_parameters(tree):
+    """
+    Finds a script's `add_parameters` function if it only makes `add_*` calls
+    with literal arguments on the object it is given.
+
+    Such a function doesn't use anything else in the script, so it can be run
+    on its own, without running the script's imports and other top-level code.
+
+    Args:
+        tree (ast.Module): The parsed script.
+
+    Returns:
+        ast.FunctionDef: The `add_parameters` function definition.
+        None: If the script doesn't define it at the top level, or it does anything else.
+    """
+    func_def = None
+    for statement in tree.body:
+        if isinstance(statement, ast.FunctionDef) and statement.name == 'add_parameters':
+            func_def = statement # The last definition is the one the script ends up with.
+    if func_def is None or func_def.decorator_list:
+        return None
+
+    # It must take exactly one plain argument (e.g., `parameters`) and nothing else.
+    arguments = func_def.args
+    if (len(arguments.args) != 1 or arguments.posonlyargs or arguments.vararg
+            or arguments.kwonlyargs or arguments.kwarg or arguments.defaults):
+        return None
+    parameters_name = arguments.args[0].arg
+
+    for statement in func_def.body:
+        if not isinstance(statement, ast.Expr):
+            return None
+        call = statement.value
+        if isinstance(call, ast.Constant):
+            continue # A docstring.
+        # Each statement must be a call like `parameters.add_int(...)`.
+        if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+                and call.func.attr.startswith('add_') and isinstance(call.func.value, ast.Name)
+                and call.func.value.id == parameters_name):
+            return None
+        for argument in [*call.args, *(keyword.value for keyword in call.keywords)]:
+            if not all(isinstance(node, LITERAL_NODE_TYPES) for node in ast.walk(argument)):
+                return None
+    return func_def
+
+@functools.lru_cache(maxsize=64)
+def _load_protocol_source(path, mtime_ns):
+    """
+    Reads and parses a protocol script once for everything that needs it.
+
+    Args:
+        path (str): The path of the script.
+        mtime_ns (int): The script's modification time, so an edited script
+                        is read again instead of coming from the cache.
+
+    Returns:
+        tuple: The script's content (str), the same content as UTF-8 bytes
+               (bytes), and its parsed tree (ast.AST), which must not be modified.
+    """
+    source_bytes = Path(path).read_bytes()
+    source_code = source_bytes.decode('utf-8')
+    return source_code, source_bytes, parse_once(source_code)
 
 def find_parameters(filename, absolute_protocols_path):
     """
     Dynamically loads a Python protocol script and extracts its parameter definitions.
 
-    This function loads a Python file as a module in memory, finds the 
+    This function compiles the Python file and runs it in a plain namespace
+    (skipping the import system, as well as asserts and docstrings), finds the 
     `add_parameters` function within it, and executes it using a `MockParameters` 
     instance to capture the defined parameters.
 
@@ -52,56 +163,55 @@ def find_parameters(filename, absolute_protocols_path):
 
     Returns:
         dict: A dictionary containing details of the extracted parameters under the 
-              key 'parameter_details', or an error message under 'parameters_error'.
+              key 'parameter_details' (a dict mapping each parameter's name to its
+              `ParamDetail`), or an error message under 'parameters_error'.
         None: Returns None if the script file does not contain an `add_parameters` function.
     """
     original_filepath = Path(absolute_protocols_path) / filename #changed
-    if not original_filepath.exists():
+    try:
+        # One stat both checks the file exists and gives the modification time for the cache key.
+        mtime_ns = original_filepath.stat().st_mtime_ns
+    except FileNotFoundError:
         print(f"Error: The file was not found at the specified path: {original_filepath}")
         # Exit gracefully if the file doesn't exist.
         exit()
     
     # Process only Python files, excluding '__init__.py'.
     if filename.endswith('.py') and filename != '__init__.py':
-            # Create a specification for the module from its file path.
-            # This spec tells Python how to load the module.
-            in_memory_module_name = "module" # Give the module a valid in-memory name, e.g., "protocol_module".
-            spec = importlib.util.spec_from_file_location(in_memory_module_name, original_filepath)
-            
-            if not spec or not spec.loader:
-                raise ImportError(f"Could not create module spec from file: {original_filepath}")
-
-            # Create a new module object based on the spec.
-            module = importlib.util.module_from_spec(spec)
-            # Execute the module's code in the newly created module object.
-            # This makes its functions and variables available.
-            spec.loader.exec_module(module)
+            cache_key = (original_filepath.resolve(), mtime_ns)
+            namespace = _NAMESPACE_CACHE.get(cache_key)
+            if namespace is not None:
+                _NAMESPACE_CACHE.move_to_end(cache_key)
+            else:
+                # Compile the script's shared parsed tree with asserts and docstrings optimized
+                # away, then run it in a throwaway namespace. This makes its functions and
+                # variables available. If `add_parameters` is self-contained, only that
+                # function is compiled and defined, and the rest of the script never runs.
+                _, _, tree = _load_protocol_source(str(original_filepath), mtime_ns)
+                func_def = find_pure_add_parameters(tree)
+                if func_def is not None:
+                    tree = ast.Module(body=[func_def], type_ignores=[])
+                code = compile(tree, str(original_filepath), 'exec', optimize=2)
+                namespace = {'__name__': '__protocol__', '__file__': str(original_filepath)}
+                exec(code, namespace)
+                _NAMESPACE_CACHE[cache_key] = namespace
+                if len(_NAMESPACE_CACHE) > NAMESPACE_CACHE_SIZE:
+                    # Drop the least recently used namespace.
+                    _NAMESPACE_CACHE.popitem(last=False)
 
             # Initialize a dictionary to store data for this specific protocol
             current_protocol_info = {"filename": filename}
-            # Check if the module has the 'add_parameters' function.
-            if hasattr(module, 'add_parameters') and callable(module.add_parameters):
-                mock_params = MockParameters()
+            # Check if the script defines the 'add_parameters' function.
+            add_parameters = namespace.get('add_parameters')
+            if callable(add_parameters):
                 try:
                     current_protocol_info = {}
                     mock_params = MockParameters()
                     
                     # Call the script's 'add_parameters' function with our mock object.
-                    # This will populate mock_params.added_parameters.
-                    module.add_parameters(mock_params)
-
-                    # A dictionary to store all details for each parameter
-                    parameter_details = {}
-                    for param in mock_params.added_parameters:
-                        name = param.get("name", "Unnamed")
-                        parameter_details[name] = {
-                            "type": param.get("type", "unknown"),
-                            "default": param.get("default_value"),
-                            "min": param.get("minimum"),
-                            "max": param.get("maximum"),
-                            "choices": param.get("choices")
-                        }
-                    current_protocol_info["parameter_details"] = parameter_details
+                    # This fills mock_params.parameter_details with all details for each parameter.
+                    add_parameters(mock_params)
+                    current_protocol_info["parameter_details"] = mock_params.parameter_details
 
                 except Exception as e:
                     # If any error occurs during parameter extraction, record it.
@@ -120,28 +230,28 @@ def print_param_details(current_protocol_info):
     if "parameter_details" in current_protocol_info:
         for name, details in current_protocol_info["parameter_details"].items():
             # Start building the output string for the current parameter
-            output = f"  - {name} ({details['type']}): "
+            output = f"  - {name} ({details.type}): "
             
             # Handle string with choices
-            if details['type'] == 'str' and details['choices']:
+            if details.type == 'str' and details.choices:
                 # Extract the 'display_name' for a cleaner look
-                choice_names = [c['display_name'] for c in details['choices']]
-                output += f"Default: '{details['default']}', Choices: [{', '.join(choice_names)}]"
+                choice_names = [c['display_name'] for c in details.choices]
+                output += f"Default: '{details.default}', Choices: [{', '.join(choice_names)}]"
             
             # Handle int/float with min/max values
-            elif details['type'] in ['int', 'float']:
+            elif details.type in ['int', 'float']:
                 parts = []
-                if details['min'] is not None:
-                    parts.append(f"Min: {details['min']}")
-                if details['default'] is not None:
-                    parts.append(f"Default: {details['default']}")
-                if details['max'] is not None:
-                    parts.append(f"Max: {details['max']}")
+                if details.min is not None:
+                    parts.append(f"Min: {details.min}")
+                if details.default is not None:
+                    parts.append(f"Default: {details.default}")
+                if details.max is not None:
+                    parts.append(f"Max: {details.max}")
                 output += ", ".join(parts)
                 
             # Handle bool and other types that only have a default value
             else:
-                output += f"Default: {details['default']}"
+                output += f"Default: {details.default}"
                 
             print(output)
     elif "parameters_error" in current_protocol_info:
@@ -149,156 +259,325 @@ def print_param_details(current_protocol_info):
 
     print("-" * 30) # Seperator
 
-def generate_combinations(protocol_info):
+def get_value_sets(protocol_info):
     """
-    Generates all possible combinations of parameter values based on their
-    defined ranges, choices, or boolean states.
+    Picks the values to test for each parameter based on its defined range,
+    choices, or boolean states.
 
     Args:
         protocol_info (dict): A dictionary containing the parameter details.
 
     Returns:
-        list[dict]: A list of dictionaries, where each dictionary represents
-                    one unique combination of parameter values.
+        tuple: The parameter names (list[str]) and, in the same order, the
+               list of values to test for each one (list[list]). Both are
+               empty if there are no parameter details.
     """
     parameter_details = protocol_info.get("parameter_details")
     if not parameter_details:
-        return []
+        return [], []
 
     # Get the names of the parameters in a fixed order to ensure consistency.
     param_names = list(parameter_details.keys())
     value_sets = []
 
-    # For each parameter, create a set of interesting values to test
+    # For each parameter, create a list of interesting values to test. A list keeps the
+    # values in a fixed order between runs and also works for values that can't be hashed.
     for name in param_names:
         details = parameter_details[name]
-        current_values = set()
+        current_values = []
+
+        def add_value(value):
+            # Skip duplicates (e.g., if default is the same as min); there are only a few values.
+            if value not in current_values:
+                current_values.append(value)
 
-        param_type = details.get("type")
+        param_type = details.type
         if param_type in ['int', 'float']:
             # Use min, default, and max as the points of interest.
-            # A set automatically handles duplicates (e.g., if default is the same as min).
-            if details.get('min') is not None:
-                current_values.add(details['min'])
-            if details.get('default') is not None:
-                current_values.add(details['default'])
-            if details.get('max') is not None:
-                current_values.add(details['max'])
-
-        elif param_type == 'str' and details.get('choices'):
+            if details.min is not None:
+                add_value(details.min)
+            if details.default is not None:
+                add_value(details.default)
+            if details.max is not None:
+                add_value(details.max)
+
+        elif param_type == 'str' and details.choices:
             # Use all available choices.
-            for choice in details['choices']:
-                current_values.add(choice['value'])
+            for choice in details.choices:
+                add_value(choice['value'])
 
         elif param_type == 'bool':
-            # Test both True and False, regardless of the default.
-            current_values.add(True)
-            current_values.add(False)
+            # Test both False and True, regardless of the default.
+            current_values = [False, True]
         
         else:
             # For other types (like csv_file), just use the default value.
-            if details.get('default') is not None:
-                current_values.add(details['default'])
+            if details.default is not None:
+                add_value(details.default)
 
         # If no specific values were found, use the default as a fallback.
         if not current_values:
-             value_sets.append([details.get('default')])
+             value_sets.append([details.default])
         else:
-            value_sets.append(list(current_values))
+            value_sets.append(current_values)
+
+    return param_names, value_sets
+
+def iter_combinations(protocol_info) -> Iterator[dict]:
+    """
+    Yields all possible combinations of parameter values one at a time, so
+    they never all have to be held in memory.
 
-    # Calculate the Cartesian product of all value sets.
-    # This creates all possible combinations of parameter values.
-    combinations_tuples = itertools.product(*value_sets)
+    Args:
+        protocol_info (dict): A dictionary containing the parameter details.
 
-    # Convert the tuples of values back into dictionaries with parameter names.
-    combinations_list = [dict(zip(param_names, combo)) for combo in combinations_tuples]
+    Yields:
+        dict: One unique combination of parameter values.
+    """
+    param_names, value_sets = get_value_sets(protocol_info)
+    if not param_names:
+        return
+
+    # Parameters with a single value are the same in every combination, so they are set
+    # once in a base dictionary (which also fixes the order of the names), and only the
+    # parameters with several values take part in the product.
+    base_combination = {name: values[0] for name, values in zip(param_names, value_sets)}
+    varying_names = [name for name, values in zip(param_names, value_sets) if len(values) > 1]
+    varying_sets = [values for values in value_sets if len(values) > 1]
+
+    # Calculate the Cartesian product of the varying value sets.
+    # This creates all possible combinations of parameter values, and each tuple
+    # of values is written over a copy of the base dictionary.
+    for combo in itertools.product(*varying_sets):
+        combination = base_combination.copy()
+        combination.update(zip(varying_names, combo))
+        yield combination
+
+def count_combinations(protocol_info):
+    """
+    Counts the combinations `iter_combinations` yields without generating them.
 
-    return combinations_list
+    Args:
+        protocol_info (dict): A dictionary containing the parameter details.
 
-class ParameterTransformer(ast.NodeTransformer):
+    Returns:
+        int: The number of combinations.
     """
-    Navigates an Abstract Syntax Tree (AST) of a Python script and modifies the 
-    'default' value in function calls like `add_int`, `add_str`, etc.
-    
-    This allows for programmatic alteration of the default values in a script's
-    parameter definitions without simple text replacement, making it robust
-    against formatting changes.
+    param_names, value_sets = get_value_sets(protocol_info)
+    return math.prod(len(values) for values in value_sets) if param_names else 0
+
+def parse_once(source_code: str) -> ast.AST:
     """
-    def __init__(self, new_defaults: dict):
-        """
-        Initializes the transformer with the new default values to apply.
-        
-        Args:
-            new_defaults (dict): A dictionary mapping parameter variable names
-                                 to their new default values.
-        """
-        self.new_defaults = new_defaults
-
-    def visit_Call(self, node: ast.Call):
-        """
-        Visits every function call node in the AST.
-
-        If the node is a call to an `add_*` method, it identifies the parameter by
-        its `variable_name` and, if a new default is specified in `self.new_defaults`,
-        it replaces the `default` keyword argument's value with the new one.
-        """
-        # We are looking for calls to add_int, add_str, etc.
-        # These are attribute calls on an object, e.g., `parameters.add_int`.
-        if isinstance(node.func, ast.Attribute) and node.func.attr.startswith('add_'):
-            variable_name = None
-            # Find the 'variable_name' argument to identify which parameter this is.
+    Parses source code into an Abstract Syntax Tree that can be reused for
+    every combination.
+
+    Args:
+        source_code (str): The original Python script content.
+
+    Returns:
+        ast.AST: The parsed tree.
+    """
+    # Type comments are never used, so the parser is told not to look for them.
+    return ast.parse(source_code, type_comments=False)
+
+def index_default_keywords(tree: ast.AST) -> dict:
+    """
+    Finds the `default` keyword of every `add_*` call in a parsed script, in a
+    single walk over the tree.
+
+    With this index, applying a combination only touches the keywords that
+    change instead of walking the whole tree and scanning every call's
+    keywords again.
+
+    Args:
+        tree (ast.AST): The tree returned by `parse_once`.
+
+    Returns:
+        dict: Maps each parameter's variable name (str) to a list of
+              (keyword, original value node) pairs, one per `add_*` call
+              that defines that parameter with a `default` keyword.
+    """
+    default_keywords = {}
+    for node in ast.walk(tree):
+        # We are looking for calls to add_int, add_str, etc., e.g. `parameters.add_int`.
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr.startswith('add_'):
+            # Both keywords are found in the same scan over the call's keywords.
+            variable_name = default_keyword = None
             for keyword in node.keywords:
-                if keyword.arg == 'variable_name':
+                if keyword.arg == 'variable_name' and variable_name is None:
                     # ast.Constant stores its value in the .value attribute
-                    variable_name = keyword.value.value 
-                    break
-            
-            # If this parameter is one we want to change...
-            if variable_name in self.new_defaults:
-                # ...find the 'default' keyword argument and change its value.
-                for keyword in node.keywords:
-                    if keyword.arg == 'default':
-                        new_value = self.new_defaults[variable_name]
-                        # Replace the old value node with a new constant node.
-                        keyword.value = ast.Constant(value=new_value)
-                        break
-        # Continue traversing the rest of the tree to visit other nodes.
-        return self.generic_visit(node)
-
-def modify_script_with_new_defaults(source_code: str, new_defaults: dict) -> str:
-    """
-    Parses source code, applies new defaults using an AST transformer,
-    and returns the modified source code.
-    
+                    variable_name = keyword.value.value
+                elif keyword.arg == 'default' and default_keyword is None:
+                    default_keyword = keyword
+            if variable_name is not None and default_keyword is not None:
+                default_keywords.setdefault(variable_name, []).append((default_keyword, default_keyword.value))
+    return default_keywords
+
+def find_default_spans(source_bytes: bytes, default_keywords: dict) -> list:
+    """
+    Locates the source text of every indexed `default` value, so new values
+    can be spliced straight into the original script.
+
     Args:
-        source_code (str): The original Python script content.
+        source_bytes (bytes): The original Python script content, encoded as UTF-8.
+        default_keywords (dict): The index returned by `index_default_keywords`
+                                 for the parsed script.
+
+    Returns:
+        list[tuple]: (start, end, variable_name) tuples giving the byte range
+                     of each default value in `source_bytes`, sorted from the
+                     end of the script to its start.
+    """
+    # Byte offset at which each line starts; line numbers in the AST begin at 1.
+    # AST column offsets also count UTF-8 bytes, so they can be added on directly.
+    line_starts = [0] + [match.end() for match in re.finditer(rb'\r\n|\r|\n', source_bytes)]
+
+    default_spans = []
+    for variable_name, keywords in default_keywords.items():
+        for _, value in keywords:
+            start = line_starts[value.lineno - 1] + value.col_offset
+            end = line_starts[value.end_lineno - 1] + value.end_col_offset
+            default_spans.append((start, end, variable_name))
+    # Splicing from the end means earlier offsets never shift.
+    default_spans.sort(reverse=True)
+    return default_spans
+
+def build_template(source_bytes: bytes, default_spans: list) -> tuple:
+    """
+    Splits the original script into fixed pieces of text and the `default`
+    values between them, once for all combinations.
+
+    Args:
+        source_bytes (bytes): The original Python script content, encoded as UTF-8.
+        default_spans (list): The spans returned by `find_default_spans` for `source_bytes`.
+
+    Returns:
+        tuple: The pieces of the script in order (list[bytes]), where each
+               default value has its own piece, and (index, variable_name)
+               pairs (list[tuple]) giving the piece that holds each value.
+    """
+    pieces = []
+    slots = []
+    position = 0
+    # The spans are sorted from the end of the script, so go through them in reverse.
+    for start, end, variable_name in reversed(default_spans):
+        pieces.append(source_bytes[position:start])
+        slots.append((len(pieces), variable_name))
+        pieces.append(source_bytes[start:end])
+        position = end
+    pieces.append(source_bytes[position:])
+    return pieces, slots
+
+# The encoded literal for each value already written, keyed by (type, value) so that
+# equal values of different types (e.g., 1 and True) keep their own text. Only
+# these types are cached: equal floats can still have different text (0.0 and
+# -0.0), and containers may hold such floats or not be hashable at all.
+_LITERAL_CACHE = {}
+CACHED_LITERAL_TYPES = (int, str, bool)
+
+def encode_literal(value) -> bytes:
+    """
+    Returns a value as Python literal text encoded as UTF-8, formatting each
+    distinct value only once since the same few values recur in almost
+    every combination.
+
+    Args:
+        value: The parameter value.
+
+    Returns:
+        bytes: The encoded `repr` of the value.
+    """
+    value_type = type(value)
+    if value_type not in CACHED_LITERAL_TYPES:
+        # Other values (e.g., floats and lists) are simply formatted every time.
+        return repr(value).encode('utf-8')
+    key = (value_type, value)
+    literal = _LITERAL_CACHE.get(key)
+    if literal is None:
+        literal = _LITERAL_CACHE[key] = repr(value).encode('utf-8')
+    return literal
+
+def apply_defaults(template: tuple, new_defaults: dict) -> bytes:
+    """
+    Applies new defaults to the original script by replacing only the source
+    text of each changed `default` value.
+
+    Everything else, including comments and formatting, is kept exactly as
+    written, and the script is never unparsed, re-encoded or searched; the
+    new values are simply joined with the fixed pieces of the template.
+
+    Args:
+        template (tuple): The template returned by `build_template`.
         new_defaults (dict): The combination of new default values to apply.
 
     Returns:
-        str: The modified Python script content.
-    """
-    # Parse the source code into an Abstract Syntax Tree.
-    tree = ast.parse(source_code)
-    # Create an instance of our transformer with the new default values.
-    transformer = ParameterTransformer(new_defaults)
-    # Apply the transformer to the tree.
-    new_tree = transformer.visit(tree)
-    # Fix any missing line numbers/locations for unparsing.
-    ast.fix_missing_locations(new_tree)
-    # Convert the modified tree back into source code.
-    return ast.unparse(new_tree)
+        bytes: The modified Python script content, encoded as UTF-8.
+    """
+    pieces, slots = template
+    pieces = pieces.copy()
+    for index, variable_name in slots:
+        if variable_name in new_defaults:
+            # Write the new value as a Python literal in place of the old one.
+            pieces[index] = encode_literal(new_defaults[variable_name])
+    return b''.join(pieces)
+
+def write_combination(template, output_dir, new_filename, existing_sizes, combo):
+    """
+    Writes the protocol file for one combination.
+
+    Args:
+        template (tuple): The template returned by `build_template`.
+        output_dir (Path): The directory where new protocol files are saved.
+        new_filename (str): The name of the new file (e.g., "1_my_protocol.py").
+        existing_sizes (dict): The sizes of the files already in `output_dir`, by name.
+        combo (dict): The combination of new default values to apply.
+
+    Returns:
+        tuple: The path of the file (Path), and whether it was written (bool).
+               It isn't written if it already exists with the same content.
+    """
+    # Modify the original script content with the new default values from the current combination.
+    modified_code = apply_defaults(template, combo)
+    new_filepath = output_dir / new_filename
+    # A file from an earlier run is only read back if its size already matches, and is
+    # left untouched if its content is the same.
+    if existing_sizes.get(new_filename) == len(modified_code) and new_filepath.read_bytes() == modified_code:
+        return new_filepath, False
+    # Write the modified content to the new file; it is already encoded.
+    new_filepath.write_bytes(modified_code)
+    return new_filepath, True
 
 # --- Main execution block ---
 if __name__ == '__main__':
     # --- Configuration ---
+    # Defaults used when no options are given on the command line.
     protocols_directory = 'Archive' # Directory name where the files you intend to work with.
-    # The directory where new protocol files will be saved
-    OUTPUT_DIR = Path("generated_protocols")
+    filename = 'file.py' # Specify the file in the provided folder that you want to analyze.
     # Get the absolute path to the protocols directory, relative to this script's location.
     current_script_dir = os.path.dirname(__file__)
-    absolute_protocols_path = os.path.join(current_script_dir, protocols_directory)
-    
-    filename = 'file.py' # Specify the file in the provided folder that you want to analyze.
+
+    # --- Command-Line Options ---
+    # Everything is chosen up front, so the script never stops to ask and several runs
+    # (e.g., one per protocol) can be started side by side.
+    parser = argparse.ArgumentParser(description="Generate protocol files for every combination of a protocol's runtime parameters.")
+    parser.add_argument('--protocol', type=Path, default=Path(current_script_dir, protocols_directory, filename),
+                        help="The protocol file to analyze (default: %(default)s).")
+    parser.add_argument('--output-dir', type=Path, default=Path("generated_protocols"),
+                        help="The directory where new protocol files will be saved (default: %(default)s).")
+    parser.add_argument('--txt', action=argparse.BooleanOptionalAction, default=False,
+                        help="Create an output.txt doc of all the combinations (default: off).")
+    parser.add_argument('--files', action=argparse.BooleanOptionalAction, default=True,
+                        help="Create the files for all combinations (default: on).")
+    parser.add_argument('--manifest', action='store_true',
+                        help="Also write manifest.txt, listing every generated file, to the output directory.")
+    parser.add_argument('--verbose', action='store_true',
+                        help="Print every combination before generating files (skipped by default, as there can be very many).")
+    args = parser.parse_args()
+
+    # The directory where new protocol files will be saved
+    OUTPUT_DIR = args.output_dir
+    absolute_protocols_path = str(args.protocol.parent)
+    filename = args.protocol.name
 
     # --- Step 1: Extract Parameters ---
     print(f"Finding parameters in '{filename}'...")
@@ -306,63 +585,82 @@ if __name__ == '__main__':
     print_param_details(current_protocol_info)
 
     # --- Step 2: Read Original Script Content ---
+    # `find_parameters` has already checked the file exists, read it and parsed it, so
+    # its bytes and tree both come from the same cached load.
     original_filepath = Path(absolute_protocols_path) / filename 
-    if not original_filepath.exists():
-        print(f"Error: The file was not found at the specified path: {original_filepath}")
-        # Exit gracefully if the file doesn't exist.
-        exit()
-    # Read the entire content of the script into a string.
-    source_script_content = original_filepath.read_text()
+    _, source_script_bytes, source_tree = _load_protocol_source(
+        str(original_filepath), original_filepath.stat().st_mtime_ns
+    )
 
     # --- Step 3: Generate Parameter Combinations ---
     print("\n--- Generating Combinations ---")
-    combinations = generate_combinations(current_protocol_info)
+    # The combinations are generated again by each step that uses them, rather than
+    # being kept in a list, since there can be a very large number of them.
+    total_combinations = count_combinations(current_protocol_info)
     
-    # Loop through the combinations to print each one with an index
-    for index, combo in enumerate(combinations, 1):
-        print(f"Combination #{index}:")
-        pprint.pprint(combo) # Pretty print the list of combination dictionaries
-        print() 
-
-    print(f"\nTotal combinations generated: {len(combinations)}")
-
-    # --- Step 4: User Prompts for File Generation ---
-    print("\n")
-    create_txt_doc = input("Do you want to create a .txt doc of all the combinations? (y/n): ").lower().strip() == 'y'
-    print("\n")
-    create_combo_files = input("Do you want to create the files for all combinations? (y/n): ").lower().strip() == 'y'
-
-    # --- Step 5: Generate Output Files (if requested) ---
-    if create_txt_doc:
+    if args.verbose:
+        # Loop through the combinations to format each one with an index, collecting
+        # them all so they are written to the terminal in a single call.
+        preview = io.StringIO()
+        for index, combo in enumerate(iter_combinations(current_protocol_info), 1):
+            preview.write(f"Combination #{index}:\n")
+            pprint.pprint(combo, stream=preview) # Pretty print each combination dictionary
+            preview.write("\n")
+        sys.stdout.write(preview.getvalue())
+
+    print(f"\nTotal combinations generated: {total_combinations}")
+
+    # --- Step 4: Generate Output Files (if requested) ---
+    if args.txt:
         print(f"\n--- Generating output.txt file in '{OUTPUT_DIR}' directory... ---")
-        OUTPUT_DIR.mkdir(exist_ok=True) # Create the output directory if it doesn't exist
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True) # Create the output directory if it doesn't exist
         new_filename = "output.txt"
         new_filepath = OUTPUT_DIR / new_filename
-        output = ""
-        # Build a single string with all combination details.
-        for index, combo in enumerate(combinations, 1):
-            output += f"\nCombination #{index}:\n"
-            output += pprint.pformat(combo)
+        # Collect the details of every combination, then join them into a single string.
+        output = []
+        for index, combo in enumerate(iter_combinations(current_protocol_info), 1):
+            output.append(f"\nCombination #{index}:\n")
+            output.append(pprint.pformat(combo))
         
         # Write the formatted string to the output file.
-        new_filepath.write_text(output)
+        new_filepath.write_text(''.join(output))
         print(f"   Generated: {new_filepath}")
 
-    if create_combo_files:
+    if args.files:
         print(f"\n--- Generating files in '{OUTPUT_DIR}' directory... ---")
-        OUTPUT_DIR.mkdir(exist_ok=True) # Create the output directory if it doesn't exist
-
-        # Iterate through each generated combination.
-        for i, combo in enumerate(combinations, 1):
-            # Modify the original script content with the new default values from the current combination.
-            modified_code = modify_script_with_new_defaults(source_script_content, combo) # Changed
-            
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True) # Create the output directory if it doesn't exist
+
+        # Split the original script around the text of its `default` values a single
+        # time; every combination then only fills in new values between the pieces.
+        # The script is already encoded, and each combination only encodes its new values.
+        default_spans = find_default_spans(source_script_bytes, index_default_keywords(source_tree))
+        template = build_template(source_script_bytes, default_spans)
+
+        # Sizes of the files left by earlier runs, from a single directory listing. Only
+        # files whose size matches their new content need to be compared.
+        with os.scandir(OUTPUT_DIR) as entries:
+            existing_sizes = {entry.name: entry.stat().st_size for entry in entries if entry.is_file()}
+
+        # Each combination is only a few byte joins and one write, so the files are written
+        # in a plain loop, taking one combination at a time from the generator; only the
+        # current combination is ever held in memory. Files are counted instead of printing
+        # a line per file, which can be thousands, and their paths are only kept if a
+        # manifest was asked for.
+        generated = [] if args.manifest else None
+        generated_count = unchanged_count = 0
+        for i, combo in enumerate(iter_combinations(current_protocol_info), 1):
             # Define the new filename (e.g., "1_my_protocol.py").
-            new_filename = f"{i}_{filename}"
-            new_filepath = OUTPUT_DIR / new_filename
-            
-            # Write the modified content to the new file.
-            new_filepath.write_text(modified_code)
-            print(f"  Generated: {new_filepath}")
+            new_filepath, written = write_combination(template, OUTPUT_DIR, f"{i}_{filename}", existing_sizes, combo)
+            generated_count += 1
+            unchanged_count += not written
+            if generated is not None:
+                generated.append(new_filepath)
+
+        print(f"  Generated {generated_count} files in {OUTPUT_DIR} ({unchanged_count} unchanged from the last run)")
+        if generated is not None:
+            # List every file in order for anything that processes them afterwards.
+            manifest_filepath = OUTPUT_DIR / "manifest.txt"
+            manifest_filepath.write_text(''.join(f"{new_filepath}\n" for new_filepath in generated))
+            print(f"  Generated: {manifest_filepath}")
 
         print("\n--- All files generated successfully! ---")
@@ -0,0 +1,58 @@
+import ast
+import hashlib
+
+"""
+A cache of parsed protocol syntax trees shared by the scripts in this folder.
+
+Trees are keyed by a hash of the file content and kept in memory for the
+current run, so a protocol is only parsed once per run, no matter which
+analysis step asks for it first.
+"""
+
+# A cache of parsed syntax trees keyed by a hash of the file content (see
+# `hash_content`), so identical sources are only ever parsed once per run.
+_AST_CACHE = {}
+
+def hash_content(content):
+    """
+    Hashes raw file content for use as a cache key.
+
+    Args:
+        content (bytes): The content to hash.
+
+    Returns:
+        str: A 128-bit BLAKE2b hex digest of the content.
+    """
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def get_tree(file_path, content=None):
+    """
+    Returns a protocol file's content alongside its parsed AST.
+
+    The tree is memoized by a hash of the file content, so every analysis step
+    can share a single `ast.parse` call instead of re-reading and re-parsing
+    the file on its own. The content is kept as raw bytes:
+    `ast.parse` decodes it itself, and byte searches skip the unicode-aware
+    string path.
+
+    Args:
+        file_path (str): The full path to the Python script to parse.
+        content (bytes, optional): The raw file content, if it was already read.
+                                   The file is read from disk when it is None.
+
+    Returns:
+        tuple: The raw file content (bytes), its hash (str) and its parsed tree (ast.Module).
+    """
+    if content is None:
+        with open(file_path, 'rb') as f:
+            content = f.read()
+
+    content_hash = hash_content(content)
+
+    tree = _AST_CACHE.get(content_hash)
+    if tree is None:
+        tree = ast.parse(content, filename=file_path)
+        _AST_CACHE[content_hash] = tree
+
+    return content, content_hash, tree